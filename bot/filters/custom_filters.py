@@ -1,19 +1,20 @@
 """
 Фильтры для обработчиков HunterBot
 """
+from typing import Optional
 from aiogram.filters import Filter
 from aiogram.types import Message
-from database.db import AsyncSessionLocal
 from database.models import User
+from bot.middlewares.user import get_user
 
 
 class IsPremiumFilter(Filter):
     """Проверяет, является ли пользователь премиум"""
     
-    async def __call__(self, message: Message) -> bool:
-        async with AsyncSessionLocal() as db:
-            user = await db.get(User, message.from_user.id)
-            return user and user.is_premium
+    async def __call__(self, message: Message, db_user: Optional[User] = None) -> bool:
+        # db_user передаёт UserMiddleware; без него - тот же кеш напрямую
+        user = db_user or await get_user(message.from_user.id)
+        return bool(user and user.is_premium)
 
 
 class IsAdminFilter(Filter):
@@ -1,39 +1,51 @@
 from aiogram import Router, F
 from aiogram.types import Message
 from database.db import AsyncSessionLocal
-from database.models import Deal, User
+from database.stats import get_admin_stats
 from config import ADMIN_ID
 from loguru import logger
-import asyncio
+from bot.utils.notifier import notifier, PRIORITY_BULK
+from scam_check.blacklist import seller_blacklist
 
 router = Router()
 
+STATUS_LABELS = {
+    "new": "🆕 Новые",
+    "waiting_payment": "💳 Ждут оплаты",
+    "waiting_ton_address": "📱 Ждут адрес",
+    "waiting_ton": "⏳ Ждут TON",
+    "completed": "✅ Завершены",
+    "cancelled": "❌ Отменены",
+    "refunded": "💸 Возвраты",
+    "timeout": "⌛ Просрочены",
+}
+
 @router.message(F.text == "/admin")
 async def admin_panel(message: Message):
     if message.from_user.id != ADMIN_ID:
         await message.answer("❌ Доступ запрещён")
         return
 
-    async with AsyncSessionLocal() as db:
-        # Исправлено для SQLAlchemy 2.x
-        result = await db.execute(
-            "SELECT id, ton_amount, price_rub, status FROM deals ORDER BY id DESC LIMIT 20"
-        )
-        deals = result.fetchall()
-
-        text = "👨‍💼 <b>АДМИН-ПАНЕЛЬ NaumHunterBot</b>\n\n"
-        total_earned = 0
-        
-        for deal_row in deals:
-            deal_id, ton_amount, price_rub, status = deal_row
-            if status == "completed":
-                commission = price_rub * 0.019  # 1.9%
-                total_earned += commission
-            text += f"#{deal_id} | {ton_amount} TON | {price_rub:,.0f}₽ | {status}\n"
+    # Готовые агрегаты - без пересчёта сделок
+    stats = await get_admin_stats()
+    today = stats["today"]
+
+    text = "👨‍💼 <b>АДМИН-ПАНЕЛЬ NaumHunterBot</b>\n\n"
+    text += "<b>Сегодня:</b>\n"
+    text += f"✅ Завершено сделок: {today['deals_completed']}\n"
+    text += f"💵 Оборот: {today['turnover_rub']:,.0f} ₽\n"
+    text += f"💰 Заработано: {today['commission_rub']:,.0f} ₽\n"
+    text += f"👥 Активных пользователей: {today['active_users']}\n\n"
 
-        text += f"\n💰 <b>Заработано сегодня:</b> {total_earned:,.0f} ₽"
+    text += "<b>Сделки по статусам:</b>\n"
+    for status, count in sorted(stats["statuses"].items(), key=lambda item: -item[1]):
+        text += f"{STATUS_LABELS.get(status, status)}: {count}\n"
 
-        await message.answer(text, parse_mode="HTML")
+    text += f"\n👤 Пользователей всего: {stats['users']}\n"
+    text += f"💵 Оборот всего: {stats['turnover_rub']:,.0f} ₽\n"
+    text += f"💰 Заработано всего: {stats['commission_rub']:,.0f} ₽"
+
+    await message.answer(text, parse_mode="HTML")
 
 @router.message(F.text.startswith("/broadcast"))
 async def broadcast(message: Message):
@@ -49,14 +61,42 @@ async def broadcast(message: Message):
         result = await db.execute("SELECT id FROM users")
         users = result.fetchall()
         
-    sent = 0
-    for user_row in users:
-        user_id = user_row[0]
-        try:
-            await message.bot.send_message(user_id, text)
-            sent += 1
-            await asyncio.sleep(0.05)  # Rate limit
-        except:
-            continue
+    # Отправкой с учётом лимитов Telegram занимается диспетчер
+    queued = notifier.enqueue_many(
+        ((user_row[0], PRIORITY_BULK) for user_row in users),
+        text
+    )
             
-    await message.answer(f"✅ Рассылка завершена. Отправлено: {sent} сообщений")
\ No newline at end of file
+    await message.answer(f"✅ Рассылка поставлена в очередь: {queued} сообщений")
+
+@router.message(F.text.startswith("/blacklist_add"))
+async def blacklist_add(message: Message):
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    # /blacklist_add <имя или часть имени> [| причина]
+    args = message.text.replace("/blacklist_add", "", 1).strip()
+    pattern, _, reason = args.partition("|")
+    if not pattern.strip():
+        await message.answer("❌ Формат: /blacklist_add имя продавца | причина")
+        return
+    
+    await seller_blacklist.add(pattern, reason.strip() or None, message.from_user.id)
+    logger.info(f"🚫 Админ добавил в черный список: {pattern.strip()}")
+    await message.answer(f"✅ Добавлено в черный список: <code>{pattern.strip().lower()}</code>", parse_mode="HTML")
+
+@router.message(F.text.startswith("/blacklist_del"))
+async def blacklist_del(message: Message):
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    pattern = message.text.replace("/blacklist_del", "", 1).strip()
+    if not pattern:
+        await message.answer("❌ Формат: /blacklist_del имя продавца")
+        return
+    
+    if await seller_blacklist.remove(pattern):
+        logger.info(f"Админ убрал из черного списка: {pattern}")
+        await message.answer(f"✅ Убрано из черного списка: <code>{pattern.lower()}</code>", parse_mode="HTML")
+    else:
+        await message.answer("❌ Такой записи нет в черном списке")
@@ -5,28 +5,42 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StateFilter
 from database.db import AsyncSessionLocal
 from database.models import Deal, User
+from database.stats import record_transition, record_new_user, record_active_user
 from escrow.yoomoney import create_payment, check_payment
 from escrow.ton_wallet import BOT_WALLET_ADDRESS
 from escrow.manager import refund_deal
+from escrow.matching import deal_memo
 from bot.states import DealStates
+from bot.middlewares.user import invalidate_user
+from bot.utils.subscriptions import subscriptions
 from bot.utils.logging_setup import log_deal_created, log_deal_status_changed, log_payment_received
 from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from loguru import logger
 import re
 
 router = Router()
 
 @router.message(Command("start"))
-async def start_cmd(message: Message):
-    async with AsyncSessionLocal() as db:
-        user = await db.get(User, message.from_user.id)
-        if not user:
-            user = User(
-                id=message.from_user.id, 
-                username=message.from_user.username
+async def start_cmd(message: Message, db_user: Optional[User]):
+    if not db_user:
+        async with AsyncSessionLocal() as db:
+            # ON CONFLICT: повторный /start до истечения кеша не упадёт
+            result = await db.execute(
+                pg_insert(User)
+                .values(id=message.from_user.id, username=message.from_user.username)
+                .on_conflict_do_nothing(index_elements=[User.id])
+                .returning(User)
             )
-            db.add(user)
+            user = result.scalar_one_or_none()
+            if user:
+                await record_new_user(db)
             await db.commit()
+        invalidate_user(message.from_user.id)
+        if user:
+            subscriptions.upsert_user(user)
             logger.info(f"Новый пользователь: {message.from_user.id}")
     
     await message.answer(
@@ -53,13 +67,15 @@ async def start_deal(message: Message):
         # Резервируем сделку
         deal.user_id = message.from_user.id
         deal.status = "waiting_payment"
+        await record_transition(db, "new", "waiting_payment")
+        await record_active_user(db, message.from_user.id)
         await db.commit()
 
         # Создаем оплату с комиссией 1.9%
         commission = deal.price_rub * 0.019
         total_amount = deal.price_rub + commission
         
-        payment = create_payment(total_amount, deal.id)
+        payment = await create_payment(total_amount, deal.id)
         deal.yoomoney_payment_id = payment["payment_id"]
         await db.commit()
 
@@ -90,14 +106,32 @@ async def user_paid(callback: CallbackQuery, state: FSMContext):
     
     async with AsyncSessionLocal() as db:
         deal = await db.get(Deal, deal_id)
+        if deal and deal.status == "waiting_ton_address":
+            # Оплату уже подтвердила фоновая сверка
+            await callback.answer("✅ Оплата уже получена, отправь TON-адрес", show_alert=True)
+            return
         if not deal or deal.status != "waiting_payment":
             await callback.answer("❌ Ошибка сделки")
             return
 
         await callback.message.edit_text("🔄 Проверяю оплату...")
         
-        if check_payment(deal.yoomoney_payment_id):
-            deal.status = "waiting_ton_address"
+        if await check_payment(deal.yoomoney_payment_id):
+            # Пока шла проверка, оплату могла подтвердить фоновая сверка -
+            # переход делает тот, чей условный UPDATE вернул строку
+            result = await db.execute(
+                text(
+                    "UPDATE deals SET status = 'waiting_ton_address', updated_at = NOW() "
+                    "WHERE id = :id AND status = 'waiting_payment' RETURNING id"
+                ),
+                {"id": deal.id}
+            )
+            if result.scalar() is None:
+                await db.rollback()
+                await callback.message.edit_text("✅ Оплата уже получена, отправь TON-адрес")
+                await callback.answer("✅ Оплата уже получена, отправь TON-адрес", show_alert=True)
+                return
+            await record_transition(db, "waiting_payment", "waiting_ton_address")
             await db.commit()
             
             await callback.message.edit_text(
@@ -140,6 +174,7 @@ async def get_ton_address(message: Message, state: FSMContext):
             await state.clear()
             return
             
+        await record_transition(db, deal.status, "waiting_ton")
         deal.buyer_ton_address = address
         deal.status = "waiting_ton"
         deal.expires_at = datetime.utcnow() + timedelta(minutes=30)
@@ -150,7 +185,9 @@ async def get_ton_address(message: Message, state: FSMContext):
         f"💼 TON-адрес: <code>{address}</code>\n\n"
         f"📱 Теперь попроси продавца перевести <b>{deal.ton_amount} TON</b>\n"
         f"💼 На кошелёк бота:\n"
-        f"<code>{BOT_WALLET_ADDRESS}</code>\n\n"
+        f"<code>{BOT_WALLET_ADDRESS}</code>\n"
+        f"📝 Комментарий к переводу (обязательно):\n"
+        f"<code>{deal_memo(deal.id)}</code>\n\n"
         f"⏰ Время на сделку: <b>30 минут</b>\n"
         f"📊 Статус: /status_{deal.id}",
         parse_mode="HTML"
@@ -247,6 +284,7 @@ async def cancel_deal(callback: CallbackQuery):
             )
         
         log_deal_status_changed(deal.id, old_status, deal.status)
+        await record_transition(db, old_status, deal.status)
         await db.commit()
         await callback.answer()
 
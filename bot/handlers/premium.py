@@ -1,7 +1,7 @@
 from aiogram import Router, F
 from aiogram.types import Message, PreCheckoutQuery, LabeledPrice
-from database.db import AsyncSessionLocal
-from database.models import User
+from bot.middlewares.user import update_user
+from bot.utils.subscriptions import subscriptions
 from loguru import logger
 
 router = Router()
@@ -25,11 +25,9 @@ async def pre_checkout(pre_checkout: PreCheckoutQuery):
 @router.message(F.successful_payment)
 async def successful_payment(message: Message):
     if message.successful_payment.invoice_payload == "premium_month":
-        async with AsyncSessionLocal() as db:
-            user = await db.get(User, message.from_user.id)
-            if user:
-                user.is_premium = True
-                await db.commit()
+        user = await update_user(message.from_user.id, is_premium=True)
+        if user:
+            subscriptions.upsert_user(user)
         
         await message.answer(
             "🎉 <b>ПРЕМИУМ АКТИВИРОВАН!</b>\n\n"
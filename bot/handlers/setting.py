@@ -2,8 +2,10 @@ from aiogram import Router, F
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from database.db import AsyncSessionLocal
+from typing import Optional
 from database.models import User
+from bot.middlewares.user import update_user
+from bot.utils.subscriptions import subscriptions
 from loguru import logger
 
 router = Router()
@@ -14,27 +16,25 @@ class SettingsStates(StatesGroup):
     waiting_for_payment = State()
 
 @router.message(F.text == "/settings")
-async def settings_cmd(message: Message):
-    async with AsyncSessionLocal() as db:
-        user = await db.get(User, message.from_user.id)
-        if not user:
-            await message.answer("❌ Сначала /start")
-            return
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🏙 Город", callback_data="set_city")],
-            [InlineKeyboardButton(text="💰 Мин. выгода %", callback_data="set_profit")],
-            [InlineKeyboardButton(text="💳 Методы оплаты", callback_data="set_payment")]
-        ])
-        
-        await message.answer(
-            f"⚙️ <b>Настройки</b>\n\n"
-            f"🏙 Город: {user.city}\n"
-            f"💰 Мин. выгода: {user.min_profit_percent}%\n"
-            f"💳 Оплата: {user.payment_methods}",
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
+async def settings_cmd(message: Message, db_user: Optional[User]):
+    if not db_user:
+        await message.answer("❌ Сначала /start")
+        return
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🏙 Город", callback_data="set_city")],
+        [InlineKeyboardButton(text="💰 Мин. выгода %", callback_data="set_profit")],
+        [InlineKeyboardButton(text="💳 Методы оплаты", callback_data="set_payment")]
+    ])
+    
+    await message.answer(
+        f"⚙️ <b>Настройки</b>\n\n"
+        f"🏙 Город: {db_user.city}\n"
+        f"💰 Мин. выгода: {db_user.min_profit_percent}%\n"
+        f"💳 Оплата: {db_user.payment_methods}",
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
 
 @router.callback_query(F.data == "set_city")
 async def set_city_callback(callback: CallbackQuery, state: FSMContext):
@@ -45,12 +45,10 @@ async def set_city_callback(callback: CallbackQuery, state: FSMContext):
 @router.message(SettingsStates.waiting_for_city)
 async def process_city(message: Message, state: FSMContext):
     city = message.text.strip()
-    async with AsyncSessionLocal() as db:
-        user = await db.get(User, message.from_user.id)
-        if user:
-            user.city = city
-            await db.commit()
-            await message.answer(f"✅ Город изменён на: {city}")
+    user = await update_user(message.from_user.id, city=city)
+    if user:
+        subscriptions.upsert_user(user)
+        await message.answer(f"✅ Город изменён на: {city}")
     await state.clear()
 
 @router.callback_query(F.data == "set_profit")
@@ -67,12 +65,10 @@ async def process_profit(message: Message, state: FSMContext):
             await message.answer("❌ Укажи процент от 0 до 50")
             return
         
-        async with AsyncSessionLocal() as db:
-            user = await db.get(User, message.from_user.id)
-            if user:
-                user.min_profit_percent = profit
-                await db.commit()
-                await message.answer(f"✅ Минимальная выгода установлена: {profit}%")
+        user = await update_user(message.from_user.id, min_profit_percent=profit)
+        if user:
+            subscriptions.upsert_user(user)
+            await message.answer(f"✅ Минимальная выгода установлена: {profit}%")
     except ValueError:
         await message.answer("❌ Введи число (например: 5)")
         return
@@ -90,10 +86,8 @@ async def set_payment_callback(callback: CallbackQuery, state: FSMContext):
 @router.message(SettingsStates.waiting_for_payment)
 async def process_payment(message: Message, state: FSMContext):
     payment_methods = message.text.strip()
-    async with AsyncSessionLocal() as db:
-        user = await db.get(User, message.from_user.id)
-        if user:
-            user.payment_methods = payment_methods
-            await db.commit()
-            await message.answer(f"✅ Методы оплаты обновлены: {payment_methods}")
+    user = await update_user(message.from_user.id, payment_methods=payment_methods)
+    if user:
+        subscriptions.upsert_user(user)
+        await message.answer(f"✅ Методы оплаты обновлены: {payment_methods}")
     await state.clear()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Middleware пользователя для HunterBot
+
+Запись User из БД берётся один раз на обновление из кеша по Telegram ID
+и передаётся хендлерам и фильтрам аргументом db_user (None - пользователь
+ещё не нажал /start). Повторные запросы db.get(User, ...) на каждое
+сообщение не нужны.
+
+Любое обновление от пользователя снимает с него отметку "заблокировал
+бота" в диспетчере уведомлений: раз он пишет боту, доставка снова
+возможна.
+
+Объект в кеше отсоединён от сессии и общий для всех обновлений - его
+нельзя менять напрямую. Изменения идут через update_user() (или запись
+в БД и invalidate_user()), чтобы следующее обновление увидело их.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import update
+from database.db import AsyncSessionLocal
+from database.models import User
+from bot.utils.cache import AsyncTTLCache
+from bot.utils.notifier import notifier
+from config import USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL
+
+_user_cache = AsyncTTLCache(USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL)
+
+
+async def get_user(user_id: int) -> Optional[User]:
+    """
+    Пользователь из кеша или БД
+
+    Args:
+        user_id: Telegram ID
+
+    Returns:
+        Отсоединённый объект User или None
+    """
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await db.get(User, user_id)
+
+    return await _user_cache.get_or_load(user_id, load)
+
+
+def invalidate_user(user_id: int):
+    """Сбрасывает кеш пользователя после изменения записи в БД"""
+    _user_cache.invalidate(user_id)
+
+
+async def update_user(user_id: int, **values) -> Optional[User]:
+    """
+    Меняет поля пользователя одним UPDATE ... RETURNING и сбрасывает кеш
+
+    Args:
+        user_id: Telegram ID
+        **values: Новые значения колонок
+
+    Returns:
+        Обновлённый User или None, если пользователя нет
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(User).where(User.id == user_id).values(**values).returning(User)
+        )
+        user = result.scalar_one_or_none()
+        await db.commit()
+    invalidate_user(user_id)
+    return user
+
+
+class UserMiddleware(BaseMiddleware):
+    """Передаёт в data["db_user"] запись пользователя из кеша и снимает блокировку рассылок"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        if from_user:
+            notifier.unblock(from_user.id)
+        data["db_user"] = await get_user(from_user.id) if from_user else None
+        return await handler(event, data)
@@ -0,0 +1,113 @@
+"""
+Асинхронный LRU-кеш с TTL для горячих чтений из БД
+
+Значения живут ttl секунд, отсутствующие (None) - negative_ttl секунд.
+Одновременные промахи по одному ключу ждут один и тот же запрос к БД
+(single-flight), поэтому всплеск уведомлений по одному продавцу не
+превращается в пачку одинаковых запросов. При записи ключ
+инвалидируется, а результат уже начатой загрузки не сохраняется.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class AsyncTTLCache:
+    """Ограниченный по размеру кеш с TTL и общей загрузкой на ключ"""
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Значение из кеша или из loader (один вызов loader на ключ)
+
+        Args:
+            key: Ключ кеша
+            loader: Корутина-функция, загружающая значение при промахе
+
+        Returns:
+            Закешированное или загруженное значение
+        """
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.hits += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили загрузившего, а не нас - загружаем сами
+                if future.cancelled():
+                    return await self.get_or_load(key, loader)
+                raise
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Ожидающие получат исключение сами; без этого asyncio пишет в лог
+                future.exception()
+            raise
+
+        # Если ключ инвалидировали во время загрузки - значение могло устареть
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Удаляет ключ и отвязывает начатую загрузку"""
+        self._data.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """Удаляет все ключи, для которых predicate(key) истинно"""
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+        for key in [key for key in self._inflight if predicate(key)]:
+            del self._inflight[key]
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
@@ -0,0 +1,234 @@
+"""
+Персистентное хранилище FSM aiogram
+
+SQLStorage хранит состояние и данные FSM в таблице fsm_storage через
+общий движок БД: пользователь посреди сделки не теряет шаг при
+перезапуске, а несколько процессов бота видят одно и то же состояние.
+
+Запись отложенная: изменения копятся в памяти и раз в FSM_FLUSH_INTERVAL
+секунд (или при FSM_FLUSH_BATCH изменениях) пишутся одной вставкой
+INSERT ... ON CONFLICT DO UPDATE. Несброшенные изменения всегда видны
+своему процессу. Кеш чтения по умолчанию выключен (FSM_CACHE_TTL=0):
+он не узнаёт о записях других процессов и мог бы вернуть чату старый
+шаг сделки. Включать его стоит, только если бот работает одним
+процессом или каждый чат обслуживается одним и тем же процессом.
+"""
+import asyncio
+import copy
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from loguru import logger
+from database.db import AsyncSessionLocal
+from database.models import FsmRecord
+from config import (
+    FSM_STORAGE, FSM_FLUSH_INTERVAL, FSM_FLUSH_BATCH, FSM_CACHE_SIZE, FSM_CACHE_TTL, REDIS_URL
+)
+
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+
+class SQLStorage(BaseStorage):
+    """FSM в PostgreSQL с кешем чтения и отложенной пакетной записью"""
+
+    def __init__(
+        self,
+        flush_interval: float,
+        flush_batch: int,
+        cache_size: int,
+        cache_ttl: float,
+        key_builder: Optional[KeyBuilder] = None
+    ):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[str, Tuple[float, Record]]" = OrderedDict()
+        self._dirty: Dict[str, Record] = {}
+        self._flushing: Dict[str, Record] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- кеш ---
+
+    def _cache_get(self, key: str) -> Optional[Record]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return record
+
+    def _cache_put(self, key: str, record: Record):
+        if self.cache_ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.cache_ttl, record)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # --- чтение/запись записей ---
+
+    async def _load(self, key: str) -> Record:
+        # Свои несброшенные изменения важнее БД
+        record = self._dirty.get(key) or self._flushing.get(key) or self._cache_get(key)
+        if record is not None:
+            return record
+
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == key)
+            )).first()
+
+        record = (row.state, json.loads(row.data or "{}")) if row else (None, {})
+        self._cache_put(key, record)
+        return record
+
+    def _write(self, key: str, record: Record):
+        self._dirty[key] = record
+        self._cache_put(key, record)
+        self._ensure_flusher()
+        if len(self._dirty) >= self.flush_batch:
+            self._wakeup.set()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        _, data = await self._load(storage_key)
+        state_name = state.state if isinstance(state, State) else state
+        self._write(storage_key, (state_name, data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        state, _ = await self._load(storage_key)
+        self._write(storage_key, (state, copy.deepcopy(dict(data))))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        return copy.deepcopy(data)
+
+    # --- отложенная запись ---
+
+    def _ensure_flusher(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи FSM в БД: {e}")
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные изменения в БД
+
+        Returns:
+            Количество записанных ключей
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            self._flushing, self._dirty = self._dirty, {}
+            now = datetime.now(timezone.utc)
+
+            # Пустое состояние (state.clear()) - удаляем строку
+            cleared = [key for key, (state, data) in self._flushing.items() if state is None and not data]
+            rows = [
+                {
+                    "key": key,
+                    "state": state,
+                    "data": json.dumps(data, ensure_ascii=False, default=str),
+                    "updated_at": now,
+                }
+                for key, (state, data) in self._flushing.items()
+                if state is not None or data
+            ]
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    if cleared:
+                        await db.execute(delete(FsmRecord).where(FsmRecord.key.in_(cleared)))
+                    for start in range(0, len(rows), self.flush_batch):
+                        stmt = pg_insert(FsmRecord).values(rows[start:start + self.flush_batch])
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[FsmRecord.key],
+                            set_={
+                                "state": stmt.excluded.state,
+                                "data": stmt.excluded.data,
+                                "updated_at": stmt.excluded.updated_at,
+                            }
+                        )
+                        await db.execute(stmt)
+                    await db.commit()
+            except Exception:
+                # Не теряем изменения: более свежие записи из _dirty не перетираем
+                for key, record in self._flushing.items():
+                    self._dirty.setdefault(key, record)
+                raise
+            finally:
+                written = len(self._flushing)
+                self._flushing = {}
+
+            return written
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            written = await self.flush()
+            if written:
+                logger.info(f"✅ FSM: записано {written} состояний при остановке")
+        except Exception as e:
+            logger.error(f"❌ Не удалось записать FSM при остановке: {e}")
+
+
+def create_fsm_storage(kind: str = FSM_STORAGE) -> BaseStorage:
+    """
+    Хранилище FSM по настройке FSM_STORAGE
+
+    Args:
+        kind: memory, sql или redis
+
+    Returns:
+        Экземпляр хранилища для Dispatcher
+    """
+    if kind == "memory":
+        logger.warning("⚠️ FSM в памяти: состояния теряются при перезапуске")
+        return MemoryStorage()
+
+    if kind == "redis":
+        # Опциональная зависимость: нужен пакет redis
+        from aiogram.fsm.storage.redis import RedisStorage
+        logger.info("✅ FSM хранится в Redis")
+        return RedisStorage.from_url(REDIS_URL)
+
+    logger.info("✅ FSM хранится в PostgreSQL")
+    return SQLStorage(FSM_FLUSH_INTERVAL, FSM_FLUSH_BATCH, FSM_CACHE_SIZE, FSM_CACHE_TTL)
@@ -0,0 +1,205 @@
+"""
+Диспетчер уведомлений HunterBot
+
+Парсеры и рассылка кладут сообщения в очередь и сразу возвращаются,
+доставкой занимается пул воркеров:
+- глобальный лимит Telegram (~30 сообщений/сек) через token bucket
+- не чаще одного сообщения в NOTIFY_CHAT_INTERVAL секунд в один чат:
+  сообщение в "занятый" чат откладывается таймером и возвращается в
+  очередь к нужному моменту, воркер тем временем берёт следующее
+- TelegramRetryAfter ставит на паузу всех воркеров и повторяет отправку
+- после TelegramForbiddenError пользователь исключается из очереди,
+  пока снова не напишет боту (unblock из UserMiddleware)
+- премиум-пользователи обслуживаются первыми
+"""
+import asyncio
+import itertools
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+from loguru import logger
+from bot.utils.rate_limiter import TokenBucket
+from config import NOTIFY_WORKERS, NOTIFY_RATE, NOTIFY_CHAT_INTERVAL
+
+# Приоритеты (меньше - раньше)
+PRIORITY_PREMIUM = 0
+PRIORITY_REGULAR = 1
+PRIORITY_BULK = 2
+
+MAX_ATTEMPTS = 3
+
+# (priority, seq, chat_id, text, kwargs, attempt)
+Item = Tuple[int, int, int, str, dict, int]
+
+
+class NotificationDispatcher:
+    """Очередь исходящих сообщений с пулом воркеров"""
+
+    def __init__(self, workers: int, rate: float, chat_interval: float):
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self._bucket = TokenBucket(rate, capacity=rate)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._tasks = []
+        self._bot: Optional[Bot] = None
+        self._last_sent: Dict[int, float] = {}
+        self._last_pruned = 0.0
+        self._deferred: Set[asyncio.TimerHandle] = set()
+        self._paused_until = 0.0
+        self.blocked: Set[int] = set()
+        self.sent = 0
+        self.failed = 0
+
+    def start(self, bot: Bot):
+        """Запускает воркеров (вызывается в on_startup)"""
+        if self._tasks:
+            return
+        self._bot = bot
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [
+            asyncio.create_task(self._worker(n)) for n in range(self.workers)
+        ]
+        logger.info(f"✅ Диспетчер уведомлений запущен ({self.workers} воркеров)")
+
+    async def stop(self):
+        """Останавливает воркеров, неотправленные сообщения теряются"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._queue is not None:
+            logger.info(f"🛑 Диспетчер уведомлений остановлен, в очереди осталось {self.pending}")
+        for handle in self._deferred:
+            handle.cancel()
+        self._deferred.clear()
+
+    @property
+    def pending(self) -> int:
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return queued + len(self._deferred)
+
+    def enqueue(self, chat_id: int, text: str, priority: int = PRIORITY_REGULAR, **kwargs) -> bool:
+        """
+        Ставит сообщение в очередь
+
+        Args:
+            chat_id: Получатель
+            text: Текст сообщения
+            priority: PRIORITY_PREMIUM / PRIORITY_REGULAR / PRIORITY_BULK
+            **kwargs: Параметры bot.send_message
+
+        Returns:
+            False если получатель заблокировал бота или диспетчер не запущен
+        """
+        if chat_id in self.blocked:
+            return False
+        if self._queue is None:
+            logger.error("❌ Диспетчер уведомлений не запущен")
+            return False
+        self._queue.put_nowait((priority, next(self._seq), chat_id, text, kwargs, 1))
+        return True
+
+    def unblock(self, chat_id: int):
+        """Возвращает пользователя в рассылки (он снова пишет боту - значит, разблокировал)"""
+        if chat_id in self.blocked:
+            self.blocked.discard(chat_id)
+            logger.info(f"✅ Пользователь {chat_id} снова получает рассылки")
+
+    def enqueue_many(self, recipients: Iterable[Tuple[int, int]], text: str, **kwargs) -> int:
+        """
+        Ставит одно сообщение в очередь нескольким получателям
+
+        Args:
+            recipients: Пары (chat_id, priority)
+            text: Текст сообщения
+
+        Returns:
+            Количество поставленных в очередь сообщений
+        """
+        return sum(
+            1 for chat_id, priority in recipients
+            if self.enqueue(chat_id, text, priority, **kwargs)
+        )
+
+    async def _worker(self, number: int):
+        while True:
+            item = await self._queue.get()
+            try:
+                if item[2] in self.blocked:
+                    continue
+                await self._deliver(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"❌ Ошибка воркера уведомлений #{number}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _defer(self, item: Item, delay: float):
+        """Возвращает сообщение в очередь через delay секунд (с прежним порядковым номером)"""
+        handle: Optional[asyncio.TimerHandle] = None
+
+        def release():
+            self._deferred.discard(handle)
+            self._queue.put_nowait(item)
+
+        handle = asyncio.get_running_loop().call_later(delay, release)
+        self._deferred.add(handle)
+
+    def _prune_last_sent(self, now: float):
+        """Забывает чаты, лимит которых уже истёк (раз в chat_interval)"""
+        if now - self._last_pruned < self.chat_interval:
+            return
+        self._last_pruned = now
+        horizon = now - self.chat_interval
+        self._last_sent = {chat_id: sent for chat_id, sent in self._last_sent.items() if sent > horizon}
+
+    async def _deliver(self, item: Item):
+        priority, _, chat_id, text, kwargs, attempt = item
+
+        # Пауза после RetryAfter действует на всех воркеров
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        # Лимит на один чат: не ждём в воркере, а откладываем сообщение
+        now = time.monotonic()
+        wait = self._last_sent.get(chat_id, 0.0) + self.chat_interval - now
+        if wait > 0:
+            self._defer(item, wait)
+            return
+        # Слот чата занимается сразу, чтобы второй воркер его не взял
+        self._last_sent[chat_id] = now
+        self._prune_last_sent(now)
+
+        await self._bucket.acquire()
+        self._last_sent[chat_id] = time.monotonic()
+
+        try:
+            await self._bot.send_message(chat_id, text, **kwargs)
+            self.sent += 1
+        except TelegramRetryAfter as e:
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"⏳ Telegram просит подождать {e.retry_after}с, повторю отправку {chat_id}")
+            self._retry(priority, chat_id, text, kwargs, attempt)
+        except TelegramForbiddenError:
+            self.blocked.add(chat_id)
+            logger.info(f"🚫 Пользователь {chat_id} заблокировал бота, исключён из рассылок")
+        except TelegramAPIError as e:
+            self.failed += 1
+            logger.warning(f"Не удалось отправить сообщение пользователю {chat_id}: {e}")
+        except Exception as e:
+            logger.warning(f"Сетевая ошибка при отправке {chat_id}: {e}")
+            self._retry(priority, chat_id, text, kwargs, attempt)
+
+    def _retry(self, priority: int, chat_id: int, text: str, kwargs: dict, attempt: int):
+        if attempt >= MAX_ATTEMPTS:
+            self.failed += 1
+            logger.warning(f"Сообщение для {chat_id} отброшено после {attempt} попыток")
+            return
+        self._queue.put_nowait((priority, next(self._seq), chat_id, text, kwargs, attempt + 1))
+
+
+notifier = NotificationDispatcher(NOTIFY_WORKERS, NOTIFY_RATE, NOTIFY_CHAT_INTERVAL)
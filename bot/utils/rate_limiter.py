@@ -0,0 +1,107 @@
+"""
+Ограничение частоты и параллельности запросов для HunterBot
+"""
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class TokenBucket:
+    """
+    Token bucket: не более rate запросов в секунду с пачкой до capacity
+
+    Ожидающие обслуживаются по очереди, к каждому разрешению
+    добавляется случайная задержка до jitter секунд (антибан).
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, jitter: float = 0.0):
+        if rate <= 0:
+            raise ValueError("rate должен быть больше 0")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.jitter = max(jitter, 0.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждет, пока в корзине появится токен, и забирает его"""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1.0
+
+        if self.jitter:
+            await asyncio.sleep(random.uniform(0, self.jitter))
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+# Один лимитер на хост/прокси
+_limiters: Dict[str, TokenBucket] = {}
+
+
+def get_rate_limiter(key: str, rate: float, capacity: float = 1.0, jitter: float = 0.0) -> TokenBucket:
+    """
+    Возвращает общий лимитер для ключа (например, "avito.ru|proxy")
+
+    Args:
+        key: Хост или хост + прокси
+        rate: Запросов в секунду
+        capacity: Размер пачки
+        jitter: Максимальная случайная задержка, секунды
+
+    Returns:
+        TokenBucket, общий для всех вызовов с этим ключом
+    """
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = TokenBucket(rate, capacity, jitter)
+        _limiters[key] = limiter
+    return limiter
+
+
+async def gather_limited(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+    concurrency: int
+) -> List[R]:
+    """
+    Запускает worker для каждого элемента, не более concurrency одновременно
+
+    Если один worker упал (или вызов отменён), остальные отменяются и
+    дожидаются завершения до того, как исключение уйдёт выше.
+
+    Returns:
+        Результаты в порядке items
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await worker(item)
+
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -0,0 +1,180 @@
+"""
+Индекс подписок: кому отправлять найденную сделку
+
+Пользователи разложены по городам, внутри города - отсортированы по
+min_profit_percent. Получатели сделки с выгодой P - это префикс каждого
+списка до P (bisect), дальше фильтр по способам оплаты. Индекс
+обновляется точечно при изменении настроек, без перечитывания users.
+
+Город объявления часто приходит адресом ("Москва, ул. Тверская",
+"м. Тверская"): ищется корзина по целой строке, затем по частям через
+запятую. Если город не опознан, сделка уходит всем подходящим по
+порогу - лучше лишнее уведомление, чем ни одного. Пользователи без
+города получают сделки из любых городов.
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from loguru import logger
+from sqlalchemy import select
+from database.db import AsyncSessionLocal
+from database.models import User
+from bot.utils.notifier import PRIORITY_PREMIUM, PRIORITY_REGULAR
+
+# Синонимы способов оплаты -> каноническое имя
+PAYMENT_ALIASES = {
+    "сбп": "sbp", "sbp": "sbp",
+    "тиньк": "tinkoff", "tinkoff": "tinkoff", "т-банк": "tinkoff", "тбанк": "tinkoff",
+    "сбер": "sber", "sber": "sber",
+    "альфа": "alfa", "alfa": "alfa",
+    "qiwi": "qiwi", "киви": "qiwi",
+    "юmoney": "yoomoney", "юмани": "yoomoney", "yoomoney": "yoomoney",
+}
+
+
+def normalize_city(city: Optional[str]) -> str:
+    return (city or "").strip().lower().replace("ё", "е")
+
+
+def normalize_payment_methods(methods: Optional[str]) -> FrozenSet[str]:
+    """'СБП,Тинькофф' -> {'sbp', 'tinkoff'}"""
+    result = set()
+    for token in (methods or "").split(","):
+        token = token.strip().lower()
+        if not token:
+            continue
+        canonical = next(
+            (name for alias, name in PAYMENT_ALIASES.items() if token.startswith(alias)),
+            token
+        )
+        result.add(canonical)
+    return frozenset(result)
+
+
+def detect_payment_methods(text: str) -> FrozenSet[str]:
+    """Способы оплаты, упомянутые в тексте объявления"""
+    text_lower = (text or "").lower()
+    return frozenset(name for alias, name in PAYMENT_ALIASES.items() if alias in text_lower)
+
+
+class Subscriber(NamedTuple):
+    min_profit: float
+    city: str
+    payment_methods: FrozenSet[str]
+    is_premium: bool
+
+
+class SubscriptionIndex:
+    """Пользователи по городам, отсортированные по порогу выгоды"""
+
+    def __init__(self):
+        self._users: Dict[int, Subscriber] = {}
+        self._by_city: Dict[str, List[Tuple[float, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def upsert(
+        self,
+        user_id: int,
+        min_profit: Optional[float],
+        city: Optional[str],
+        payment_methods: Optional[str],
+        is_premium: bool
+    ):
+        """Добавляет пользователя или обновляет его фильтры"""
+        self.remove(user_id)
+        subscriber = Subscriber(
+            min_profit=min_profit if min_profit is not None else 4.0,
+            city=normalize_city(city),
+            payment_methods=normalize_payment_methods(payment_methods),
+            is_premium=bool(is_premium)
+        )
+        self._users[user_id] = subscriber
+        insort(self._by_city.setdefault(subscriber.city, []), (subscriber.min_profit, user_id))
+
+    def upsert_user(self, user: User):
+        self.upsert(user.id, user.min_profit_percent, user.city, user.payment_methods, user.is_premium)
+
+    def remove(self, user_id: int):
+        subscriber = self._users.pop(user_id, None)
+        if subscriber is None:
+            return
+        bucket = self._by_city[subscriber.city]
+        del bucket[bisect_left(bucket, (subscriber.min_profit, user_id))]
+        if not bucket:
+            del self._by_city[subscriber.city]
+
+    def city_key(self, city: Optional[str]) -> Optional[str]:
+        """
+        Корзина индекса для города объявления
+
+        Returns:
+            Ключ корзины или None, если город не задан или не опознан
+        """
+        key = normalize_city(city)
+        if not key:
+            return None
+        if key in self._by_city:
+            return key
+        # Адрес: "Москва, ул. Тверская, 1" -> "москва"
+        for part in key.split(","):
+            part = part.strip()
+            if part and part in self._by_city:
+                return part
+        return None
+
+    def match(
+        self,
+        profit_percent: float,
+        city: Optional[str] = None,
+        payment_methods: Iterable[str] = ()
+    ) -> List[Tuple[int, int]]:
+        """
+        Получатели сделки
+
+        Args:
+            profit_percent: Выгода сделки
+            city: Город или адрес объявления (None или не опознан - все города)
+            payment_methods: Способы оплаты из объявления (пусто - без фильтра)
+
+        Returns:
+            Пары (user_id, priority) для диспетчера уведомлений
+        """
+        city_key = self.city_key(city)
+        if city_key is None:
+            buckets = self._by_city.values()
+        else:
+            buckets = [self._by_city[city_key]]
+            # Без города в настройках - сделки из любых городов
+            if "" in self._by_city:
+                buckets.append(self._by_city[""])
+
+        methods = frozenset(payment_methods)
+        recipients = []
+        for bucket in buckets:
+            end = bisect_right(bucket, (profit_percent, float("inf")))
+            for _, user_id in bucket[:end]:
+                subscriber = self._users[user_id]
+                if methods and subscriber.payment_methods and not (methods & subscriber.payment_methods):
+                    continue
+                recipients.append(
+                    (user_id, PRIORITY_PREMIUM if subscriber.is_premium else PRIORITY_REGULAR)
+                )
+        return recipients
+
+
+subscriptions = SubscriptionIndex()
+
+
+async def warm_subscriptions():
+    """Загружает фильтры всех пользователей (вызывается в on_startup)"""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(User.id, User.min_profit_percent, User.city, User.payment_methods, User.is_premium)
+            )
+            for row in result.fetchall():
+                subscriptions.upsert(*row)
+        logger.info(f"✅ Индекс подписок загружен: {len(subscriptions)} пользователей")
+    except Exception as e:
+        logger.error(f"Ошибка загрузки индекса подписок: {e}")
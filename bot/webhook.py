@@ -0,0 +1,169 @@
+"""
+Webhook-режим NaumHunterBot
+
+aiohttp-приложение принимает обновления Telegram, сразу отвечает 200 и
+раскладывает их по WEBHOOK_WORKERS очередям-шардам по id чата. Каждый
+шард обрабатывается своим воркером последовательно: порядок обновлений
+одного чата сохраняется, а разные чаты обрабатываются параллельно, и
+медленный хендлер одного пользователя не задерживает остальных.
+
+Локальная проверка: POST записанных обновлений на WEBHOOK_PATH
+(см. benchmarks/bench_webhook.py).
+"""
+import asyncio
+import zlib
+from typing import List, Optional
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from loguru import logger
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+    WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def shard_key(raw: dict) -> int:
+    """
+    Ключ шардирования: id чата (или пользователя) из сырого обновления
+
+    Args:
+        raw: JSON обновления Telegram
+
+    Returns:
+        Целое число, одинаковое для всех обновлений одного чата
+    """
+    for field, event in raw.items():
+        if field == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return int(chat["id"])
+        user = event.get("from") or event.get("user")
+        if user and "id" in user:
+            return int(user["id"])
+    return int(raw.get("update_id", 0))
+
+
+class ShardedUpdateQueue:
+    """Очереди обновлений по шардам с одним воркером на шард"""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._bot: Optional[Bot] = None
+        self._dp: Optional[Dispatcher] = None
+
+    def start(self, bot: Bot, dp: Dispatcher):
+        if self._tasks:
+            return
+        self._bot = bot
+        self._dp = dp
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+        logger.info(f"✅ Обработка обновлений: {self.workers} воркеров")
+
+    def submit(self, raw: dict) -> bool:
+        """
+        Ставит обновление в шард его чата
+
+        Returns:
+            False если очередь шарда переполнена
+        """
+        queue = self._queues[zlib.crc32(str(shard_key(raw)).encode()) % self.workers]
+        try:
+            queue.put_nowait(raw)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def pending(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            raw = await queue.get()
+            try:
+                update = Update.model_validate(raw, context={"bot": self._bot})
+                await self._dp.feed_update(self._bot, update)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки обновления {raw.get('update_id')}: {e}")
+            finally:
+                queue.task_done()
+
+    async def stop(self, timeout: float = 10.0):
+        """Дожидается обработки принятых обновлений и останавливает воркеров"""
+        if self._queues:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(queue.join() for queue in self._queues)), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Не обработано обновлений при остановке: {self.pending()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+
+
+def create_webhook_app(updates: ShardedUpdateQueue, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET) -> web.Application:
+    """
+    aiohttp-приложение, принимающее обновления
+
+    Args:
+        updates: Запущенная очередь обновлений
+        path: Путь webhook
+        secret: Секрет из setWebhook (пусто - без проверки)
+    """
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        try:
+            raw = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        # Корректный JSON, но не объект ([], 1, "x") - не обновление
+        if not isinstance(raw, dict):
+            return web.Response(status=400)
+        # 503 - Telegram повторит доставку позже
+        if not updates.submit(raw):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"pending": updates.pending()})
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get("/health", health)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Регистрирует webhook и обслуживает его до остановки процесса"""
+    updates = ShardedUpdateQueue(WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE)
+    updates.start(bot, dp)
+
+    runner = web.AppRunner(create_webhook_app(updates))
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+
+    await bot.set_webhook(
+        f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=dp.resolve_used_update_types()
+    )
+    logger.info(f"✅ Webhook слушает {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await updates.stop()
+        await bot.session.close()
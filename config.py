@@ -9,4 +9,93 @@ YOOMONEY_TOKEN = os.getenv("YOOMONEY_TOKEN")
 YOOMONEY_WALLET = os.getenv("YOOMONEY_WALLET")
 TONCENTER_API_KEY = os.getenv("TONCENTER_API_KEY")
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
-MNEMONIC = os.getenv("MNEMONIC", "")  # ← ПЕРЕНЕСЕН ИЗ TON_WALLET
\ No newline at end of file
+MNEMONIC = os.getenv("MNEMONIC", "")  # ← ПЕРЕНЕСЕН ИЗ TON_WALLET
+
+# HTTP клиент парсеров
+HTTP_LIMIT = int(os.getenv("HTTP_LIMIT", "100"))  # Всего соединений в пуле
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "10"))  # Соединений на хост
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))  # Кеш DNS, секунды
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))  # Keep-alive, секунды
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))  # Таймаут запроса, секунды
+
+# Антибан-бюджет парсеров
+AVITO_RPS = float(os.getenv("AVITO_RPS", "1.0"))  # Запросов в секунду к Avito
+YULA_RPS = float(os.getenv("YULA_RPS", "1.0"))  # Запросов в секунду к Юле
+SCRAPE_BURST = float(os.getenv("SCRAPE_BURST", "1"))  # Размер пачки запросов
+SCRAPE_JITTER = float(os.getenv("SCRAPE_JITTER", "0.5"))  # Случайная задержка, секунды
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "3"))  # Параллельных запросов на парсер
+SCRAPE_MAX_PAGES = int(os.getenv("SCRAPE_MAX_PAGES", "5"))  # Глубже первой страницы - только при наплыве новых
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))  # Очередь между стадиями обработки объявлений
+PIPELINE_BATCH = int(os.getenv("PIPELINE_BATCH", "50"))  # Сделок в одной вставке в БД
+PIPELINE_LINGER = float(os.getenv("PIPELINE_LINGER", "0.5"))  # Предел ожидания неполной пачки от первой сделки в ней, секунды
+SCRAPE_MIN_INTERVAL = float(os.getenv("SCRAPE_MIN_INTERVAL", "45"))  # Самый частый проход площадки, секунды
+SCRAPE_MAX_INTERVAL = float(os.getenv("SCRAPE_MAX_INTERVAL", "900"))  # Самый редкий проход, секунды
+SCRAPE_TARGET_NEW = float(os.getenv("SCRAPE_TARGET_NEW", "0.7"))  # Новых объявлений за проход, при котором интервал равен базовому
+SCRAPE_EWMA_ALPHA = float(os.getenv("SCRAPE_EWMA_ALPHA", "0.1"))  # Сглаживание темпа новых объявлений
+
+# Пул прокси парсеров
+SCRAPE_PROXIES = [proxy.strip() for proxy in os.getenv("SCRAPE_PROXIES", "").split(",") if proxy.strip()]  # Через запятую; пусто - напрямую
+PROXY_COOLDOWN = float(os.getenv("PROXY_COOLDOWN", "300"))  # Пауза прокси после 403/429, секунды (удваивается при повторных)
+PROXY_MAX_COOLDOWN = float(os.getenv("PROXY_MAX_COOLDOWN", "3600"))  # Самая долгая пауза, секунды
+PROXY_MAX_ERRORS = int(os.getenv("PROXY_MAX_ERRORS", "3"))  # Сетевых ошибок подряд до паузы
+PROXY_STICKY_TTL = float(os.getenv("PROXY_STICKY_TTL", "600"))  # Закрепление прокси за поисковым запросом, секунды
+PROXY_ATTEMPTS = int(os.getenv("PROXY_ATTEMPTS", "2"))  # Попыток запроса через разные прокси
+
+# Дедупликация объявлений
+SEEN_INDEX_SIZE = int(os.getenv("SEEN_INDEX_SIZE", "200000"))  # Максимум ID в памяти
+
+# Диспетчер уведомлений
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "8"))  # Воркеров отправки
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "25"))  # Сообщений в секунду (лимит Telegram ~30)
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1.0"))  # Секунд между сообщениями в один чат
+
+# Оракул курса TON/RUB
+PRICE_REFRESH_INTERVAL = float(os.getenv("PRICE_REFRESH_INTERVAL", "60"))  # Фоновое обновление, секунды
+PRICE_MAX_AGE = float(os.getenv("PRICE_MAX_AGE", "300"))  # Старше - курс не используется, проходы пропускаются
+
+# Мониторинг входящих TON
+TON_POLL_MIN = float(os.getenv("TON_POLL_MIN", "3"))  # Интервал опроса при активности, секунды
+TON_POLL_MAX = float(os.getenv("TON_POLL_MAX", "30"))  # Интервал опроса в тишине, секунды
+TON_PAGE_SIZE = int(os.getenv("TON_PAGE_SIZE", "30"))  # Транзакций на страницу
+
+# Очередь выплат TON
+PAYOUT_BATCH_SIZE = int(os.getenv("PAYOUT_BATCH_SIZE", "4"))  # Переводов в одном сообщении (v4r2 - до 4)
+PAYOUT_INTERVAL = float(os.getenv("PAYOUT_INTERVAL", "5"))  # Проверка очереди и seqno, секунды
+PAYOUT_CONFIRM_TIMEOUT = float(os.getenv("PAYOUT_CONFIRM_TIMEOUT", "90"))  # Без подтверждения дольше - переотправка
+PAYOUT_MAX_ATTEMPTS = int(os.getenv("PAYOUT_MAX_ATTEMPTS", "5"))  # Попыток до статуса failed
+
+# YooMoney
+YOOMONEY_TIMEOUT = float(os.getenv("YOOMONEY_TIMEOUT", "15"))  # Таймаут HTTP-запроса к API, секунды
+PAYMENT_RECONCILE_INTERVAL = float(os.getenv("PAYMENT_RECONCILE_INTERVAL", "20"))  # Сверка оплат, секунды
+
+# Черный список продавцов
+BLACKLIST_REFRESH_INTERVAL = float(os.getenv("BLACKLIST_REFRESH_INTERVAL", "30"))  # Проверка новых записей, секунды
+BLACKLIST_FULL_RELOAD = float(os.getenv("BLACKLIST_FULL_RELOAD", "600"))  # Полная перезагрузка списка, секунды
+
+# Кеш рейтингов и отзывов продавцов
+RATING_CACHE_SIZE = int(os.getenv("RATING_CACHE_SIZE", "10000"))  # Ключей в кеше
+RATING_CACHE_TTL = float(os.getenv("RATING_CACHE_TTL", "300"))  # Время жизни, секунды
+RATING_CACHE_NEGATIVE_TTL = float(os.getenv("RATING_CACHE_NEGATIVE_TTL", "60"))  # Для "нет данных", секунды
+
+# Кеш пользователей (middleware)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))  # Пользователей в кеше
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "120"))  # Время жизни, секунды
+USER_CACHE_NEGATIVE_TTL = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "10"))  # Для незарегистрированных, секунды
+
+# Хранилище FSM
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sql")  # memory, sql или redis
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))  # Отложенная запись в БД, секунды
+FSM_FLUSH_BATCH = int(os.getenv("FSM_FLUSH_BATCH", "200"))  # Запись сразу при таком числе изменений
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "50000"))  # Ключей в кеше чтения
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "0"))  # Кеш чтения, секунды (0 - без кеша; >0 только для одного процесса)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")  # Для FSM_STORAGE=redis
+
+# Режим получения обновлений
+BOT_MODE = os.getenv("BOT_MODE", "polling")  # polling или webhook
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # Публичный адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # X-Telegram-Bot-Api-Secret-Token
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "16"))  # Параллельных обработчиков (шардов по чатам)
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))  # Очередь на шард, дальше 503
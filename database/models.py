@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, BigInteger, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, BigInteger, Text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Index
+from sqlalchemy import Index, Sequence, UniqueConstraint
 from datetime import datetime, timezone
 
 Base = declarative_base()
@@ -30,7 +30,7 @@ class Deal(Base):
     profit_percent = Column(Float, nullable=False)
     status = Column(String(20), default="new", index=True)
     yoomoney_payment_id = Column(String(100))
-    ton_tx_hash = Column(String(100))
+    ton_tx_hash = Column(String(100), unique=True)  # Один перевод - одна сделка
     expires_at = Column(DateTime)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
@@ -58,7 +58,8 @@ class SellerRating(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     __table_args__ = (
-        Index('ix_seller_platform', 'seller_name', 'platform'),
+        # Один рейтинг на продавца на платформе - цель для INSERT ... ON CONFLICT
+        UniqueConstraint('seller_name', 'platform', name='uq_seller_platform'),
     )
 
 class SellerReview(Base):
@@ -77,4 +78,89 @@ class SellerReview(Base):
     __table_args__ = (
         Index('ix_reviews_seller', 'seller_name'),
         Index('ix_reviews_deal', 'deal_id'),
-    )
\ No newline at end of file
+    )
+
+class TonCursor(Base):
+    """Курсор последней обработанной транзакции кошелька бота"""
+    __tablename__ = "ton_cursors"
+    
+    address = Column(String(64), primary_key=True)
+    last_lt = Column(BigInteger, nullable=False, default=0)
+    last_hash = Column(String(64), nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+class Payout(Base):
+    """Исходящий перевод покупателю (очередь выплат)"""
+    __tablename__ = "payouts"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    deal_id = Column(Integer, unique=True, nullable=False)  # Одна выплата на сделку
+    user_id = Column(BigInteger, nullable=False)
+    to_address = Column(String(64), nullable=False)
+    amount_nano = Column(BigInteger, nullable=False)
+    comment = Column(String(120), default="")
+    status = Column(String(20), default="pending", index=True)  # pending, sent, confirmed, failed
+    seqno = Column(BigInteger, nullable=True)  # seqno внешнего сообщения, в котором ушла выплата
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime, nullable=True)
+    confirmed_at = Column(DateTime, nullable=True)
+
+# Версия черного списка: растёт при каждом добавлении/удалении записи
+blacklist_version_seq = Sequence("seller_blacklist_version_seq")
+
+class BlacklistEntry(Base):
+    """Черный список продавцов (подстрока имени)"""
+    __tablename__ = "seller_blacklist"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    pattern = Column(String(100), unique=True, nullable=False)  # В нижнем регистре
+    reason = Column(String(200), nullable=True)
+    added_by = Column(BigInteger, nullable=True)
+    is_active = Column(Boolean, default=True)  # Удаление - через is_active, чтобы версия дошла до всех
+    version = Column(BigInteger, blacklist_version_seq, server_default=blacklist_version_seq.next_value(), nullable=False, index=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class StatsCounter(Base):
+    """Накопительные счётчики админ-статистики (status:<статус>, users, turnover_rub...)"""
+    __tablename__ = "stats_counters"
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(Float, nullable=False, default=0.0)
+
+class DailyStats(Base):
+    """Статистика за день, обновляется на переходах статусов сделок"""
+    __tablename__ = "daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    deals_completed = Column(Integer, nullable=False, default=0)
+    turnover_rub = Column(Float, nullable=False, default=0.0)
+    commission_rub = Column(Float, nullable=False, default=0.0)
+    active_users = Column(Integer, nullable=False, default=0)
+
+class DailyActiveUser(Base):
+    """Пользователи, начинавшие сделки в этот день (для подсчёта active_users)"""
+    __tablename__ = "daily_active_users"
+    
+    day = Column(Date, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+
+class FsmRecord(Base):
+    """Состояние и данные FSM aiogram (персистентное хранилище)"""
+    __tablename__ = "fsm_storage"
+    
+    key = Column(String(200), primary_key=True)  # fsm:<bot_id>:<chat_id>:<user_id>
+    state = Column(String(100), nullable=True)
+    data = Column(Text, nullable=False, default="{}")  # JSON
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+class ScrapeCursor(Base):
+    """Верхняя граница просмотренной выдачи по поисковому запросу"""
+    __tablename__ = "scrape_cursors"
+    
+    source = Column(String(20), primary_key=True)  # avito, yula
+    query = Column(String(200), primary_key=True)
+    last_item_id = Column(String(64), nullable=True)  # Самое свежее объявление
+    last_posted_at = Column(DateTime(timezone=True), nullable=True)
+    recent_ids = Column(Text, nullable=False, default="[]")  # JSON: ID с верха выдачи
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
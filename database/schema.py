@@ -0,0 +1,87 @@
+"""
+Доводка схемы уже развёрнутых баз
+
+create_all создаёт только отсутствующие таблицы и не меняет
+существующие, поэтому ограничения, добавленные в модели позже,
+на старой базе появляются только здесь. Каждый шаг идемпотентен:
+проверяет, есть ли уже ограничение, и при необходимости сначала
+убирает дубликаты, из-за которых оно не создалось бы.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+
+async def _constraint_exists(conn: AsyncConnection, table: str, name: str) -> bool:
+    result = await conn.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = CAST(:table AS regclass)"),
+        {"name": name, "table": table}
+    )
+    return result.first() is not None
+
+
+async def _ensure_seller_platform_unique(conn: AsyncConnection):
+    """
+    uq_seller_platform на seller_ratings - цель ON CONFLICT в rating_system
+
+    Дубликаты (seller_name, platform) сливаются в строку с наименьшим id:
+    счётчики и объём суммируются, оценка доверия - среднее, взвешенное
+    по числу сделок.
+    """
+    if await _constraint_exists(conn, "seller_ratings", "uq_seller_platform"):
+        return
+
+    merged = await conn.execute(text(
+        "WITH dup AS ("
+        "  SELECT seller_name, platform, MIN(id) AS keep_id, "
+        "    SUM(total_deals) AS total_deals, SUM(successful_deals) AS successful_deals, "
+        "    SUM(failed_deals) AS failed_deals, SUM(total_volume_rub) AS total_volume_rub, "
+        "    SUM(trust_score * total_deals) / NULLIF(SUM(total_deals), 0) AS trust_score, "
+        "    MAX(last_seen) AS last_seen, MIN(created_at) AS created_at "
+        "  FROM seller_ratings GROUP BY seller_name, platform HAVING COUNT(*) > 1"
+        ") "
+        "UPDATE seller_ratings r SET total_deals = dup.total_deals, successful_deals = dup.successful_deals, "
+        "  failed_deals = dup.failed_deals, total_volume_rub = dup.total_volume_rub, "
+        "  trust_score = COALESCE(dup.trust_score, r.trust_score), "
+        "  last_seen = dup.last_seen, created_at = dup.created_at "
+        "FROM dup WHERE r.id = dup.keep_id"
+    ))
+    await conn.execute(text(
+        "DELETE FROM seller_ratings a USING seller_ratings b "
+        "WHERE a.seller_name = b.seller_name AND a.platform = b.platform AND a.id > b.id"
+    ))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_seller_platform"))
+    await conn.execute(text(
+        "ALTER TABLE seller_ratings ADD CONSTRAINT uq_seller_platform UNIQUE (seller_name, platform)"
+    ))
+    logger.info(f"✅ seller_ratings: добавлено ограничение uq_seller_platform (слито продавцов: {merged.rowcount})")
+
+
+async def _ensure_ton_tx_hash_unique(conn: AsyncConnection):
+    """
+    Уникальный индекс deals.ton_tx_hash: один перевод TON - одна сделка
+
+    Имя совпадает с тем, что create_all даёт ограничению unique=True, поэтому
+    на новой базе шаг ничего не делает. Дубликаты не удаляются - какой из
+    сделок принадлежит перевод, решает человек: индекс не создаётся, в лог
+    пишутся сделки с общим хешем.
+    """
+    duplicates = (await conn.execute(text(
+        "SELECT ton_tx_hash, array_agg(id ORDER BY id) FROM deals "
+        "WHERE ton_tx_hash IS NOT NULL GROUP BY ton_tx_hash HAVING COUNT(*) > 1"
+    ))).fetchall()
+    if duplicates:
+        listed = "; ".join(f"{tx_hash}: {', '.join(map(str, ids))}" for tx_hash, ids in duplicates[:20])
+        logger.error(
+            f"❌ deals: один ton_tx_hash у нескольких сделок ({len(duplicates)}), "
+            f"уникальный индекс не создан - разберите вручную: {listed}"
+        )
+        return
+
+    await conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS deals_ton_tx_hash_key ON deals (ton_tx_hash)"))
+
+
+async def upgrade_schema(conn: AsyncConnection):
+    """Добавляет недостающие ограничения (вызывается в on_startup после create_all)"""
+    await _ensure_seller_platform_unique(conn)
+    await _ensure_ton_tx_hash_unique(conn)
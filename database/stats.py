@@ -0,0 +1,185 @@
+"""
+Агрегаты статистики для админ-панели
+
+Счётчики (сделки по статусам, пользователи, оборот, комиссия) и дневная
+статистика обновляются инкрементально в той же транзакции, что и переход
+статуса сделки, поэтому админ-панель читает несколько готовых строк, а
+не пересчитывает сделки. При первом запуске на существующей базе
+агрегаты один раз пересобираются из deals/users.
+"""
+from collections import defaultdict
+from typing import Dict, Optional
+from sqlalchemy import text
+from loguru import logger
+from database.db import AsyncSessionLocal
+
+COMMISSION_RATE = 0.019  # Комиссия сервиса с покупателя
+
+
+async def _bump_counters(db, deltas: Dict[str, float]):
+    """Прибавляет значения к счётчикам (в порядке имён - без взаимных блокировок)"""
+    params = [{"name": name, "delta": delta} for name, delta in sorted(deltas.items()) if delta]
+    if not params:
+        return
+    await db.execute(
+        text(
+            "INSERT INTO stats_counters (name, value) VALUES (:name, :delta) "
+            "ON CONFLICT (name) DO UPDATE SET value = stats_counters.value + EXCLUDED.value"
+        ),
+        params
+    )
+
+
+async def _bump_daily(db, deals_completed: int = 0, turnover_rub: float = 0.0,
+                      commission_rub: float = 0.0, active_users: int = 0):
+    await db.execute(
+        text(
+            "INSERT INTO daily_stats (day, deals_completed, turnover_rub, commission_rub, active_users) "
+            "VALUES (CURRENT_DATE, :deals_completed, :turnover_rub, :commission_rub, :active_users) "
+            "ON CONFLICT (day) DO UPDATE SET "
+            "deals_completed = daily_stats.deals_completed + EXCLUDED.deals_completed, "
+            "turnover_rub = daily_stats.turnover_rub + EXCLUDED.turnover_rub, "
+            "commission_rub = daily_stats.commission_rub + EXCLUDED.commission_rub, "
+            "active_users = daily_stats.active_users + EXCLUDED.active_users"
+        ),
+        {
+            "deals_completed": deals_completed,
+            "turnover_rub": turnover_rub,
+            "commission_rub": commission_rub,
+            "active_users": active_users,
+        }
+    )
+
+
+async def record_transition(db, old_status: Optional[str], new_status: str,
+                            count: int = 1, turnover_rub: float = 0.0):
+    """
+    Учитывает переход статуса сделок (вызывается до commit в той же сессии)
+
+    Args:
+        db: Сессия, в которой меняется статус
+        old_status: Прежний статус (None - новая сделка)
+        new_status: Новый статус
+        count: Сколько сделок перешло
+        turnover_rub: Сумма сделок, если они завершены
+    """
+    if count <= 0 or old_status == new_status:
+        return
+
+    deltas = defaultdict(float)
+    if old_status:
+        deltas[f"status:{old_status}"] -= count
+    deltas[f"status:{new_status}"] += count
+
+    if new_status == "completed":
+        commission_rub = turnover_rub * COMMISSION_RATE
+        deltas["turnover_rub"] += turnover_rub
+        deltas["commission_rub"] += commission_rub
+        await _bump_daily(db, deals_completed=count, turnover_rub=turnover_rub, commission_rub=commission_rub)
+
+    await _bump_counters(db, deltas)
+
+
+async def record_new_user(db):
+    """Учитывает регистрацию пользователя"""
+    await _bump_counters(db, {"users": 1})
+
+
+async def record_active_user(db, user_id: int):
+    """Отмечает пользователя активным сегодня (один раз в день)"""
+    result = await db.execute(
+        text(
+            "INSERT INTO daily_active_users (day, user_id) VALUES (CURRENT_DATE, :user_id) "
+            "ON CONFLICT DO NOTHING RETURNING user_id"
+        ),
+        {"user_id": user_id}
+    )
+    if result.first() is not None:
+        await _bump_daily(db, active_users=1)
+
+
+async def rebuild_stats_if_empty():
+    """Пересобирает агрегаты из deals/users, если их ещё нет (вызывается в on_startup)"""
+    try:
+        async with AsyncSessionLocal() as db:
+            exists = (await db.execute(text("SELECT 1 FROM stats_counters LIMIT 1"))).first()
+            if exists is not None:
+                return
+
+            deltas: Dict[str, float] = {}
+            result = await db.execute(text("SELECT status, COUNT(*) FROM deals GROUP BY status"))
+            for status, count in result.fetchall():
+                deltas[f"status:{status}"] = count
+
+            users = (await db.execute(text("SELECT COUNT(*) FROM users"))).scalar()
+            turnover = (await db.execute(
+                text("SELECT COALESCE(SUM(price_rub), 0) FROM deals WHERE status = 'completed'")
+            )).scalar()
+            deltas["users"] = users
+            deltas["turnover_rub"] = turnover
+            deltas["commission_rub"] = turnover * COMMISSION_RATE
+            # Маркер: агрегаты собраны, даже если база пустая
+            deltas["rebuilt"] = 1
+            await _bump_counters(db, deltas)
+
+            await db.execute(
+                text(
+                    "INSERT INTO daily_active_users (day, user_id) "
+                    "SELECT DISTINCT CAST(updated_at AS DATE), user_id FROM deals "
+                    "WHERE user_id <> 0 AND updated_at IS NOT NULL "
+                    "ON CONFLICT DO NOTHING"
+                )
+            )
+            await db.execute(
+                text(
+                    "INSERT INTO daily_stats (day, deals_completed, turnover_rub, commission_rub, active_users) "
+                    "SELECT d.day, COALESCE(c.deals, 0), COALESCE(c.turnover, 0), "
+                    "COALESCE(c.turnover, 0) * :rate, COALESCE(a.users, 0) "
+                    "FROM (SELECT day FROM daily_active_users UNION "
+                    "      SELECT CAST(updated_at AS DATE) FROM deals WHERE status = 'completed') d "
+                    "LEFT JOIN (SELECT CAST(updated_at AS DATE) AS day, COUNT(*) AS deals, SUM(price_rub) AS turnover "
+                    "           FROM deals WHERE status = 'completed' GROUP BY 1) c ON c.day = d.day "
+                    "LEFT JOIN (SELECT day, COUNT(*) AS users FROM daily_active_users GROUP BY day) a ON a.day = d.day "
+                    "WHERE d.day IS NOT NULL "
+                    "ON CONFLICT (day) DO NOTHING"
+                ),
+                {"rate": COMMISSION_RATE}
+            )
+            await db.commit()
+            logger.info("✅ Статистика пересобрана из истории сделок")
+    except Exception as e:
+        logger.error(f"Ошибка пересборки статистики: {e}")
+
+
+async def get_admin_stats() -> Dict:
+    """
+    Готовые агрегаты для админ-панели
+
+    Returns:
+        {"statuses": {status: count}, "users", "turnover_rub", "commission_rub", "today": {...}}
+    """
+    async with AsyncSessionLocal() as db:
+        counters = dict((await db.execute(text("SELECT name, value FROM stats_counters"))).fetchall())
+        today = (await db.execute(
+            text(
+                "SELECT deals_completed, turnover_rub, commission_rub, active_users "
+                "FROM daily_stats WHERE day = CURRENT_DATE"
+            )
+        )).first()
+
+    return {
+        "statuses": {
+            name.split(":", 1)[1]: int(value)
+            for name, value in counters.items()
+            if name.startswith("status:") and value
+        },
+        "users": int(counters.get("users", 0)),
+        "turnover_rub": counters.get("turnover_rub", 0.0),
+        "commission_rub": counters.get("commission_rub", 0.0),
+        "today": {
+            "deals_completed": today[0] if today else 0,
+            "turnover_rub": today[1] if today else 0.0,
+            "commission_rub": today[2] if today else 0.0,
+            "active_users": today[3] if today else 0,
+        },
+    }
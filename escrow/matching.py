@@ -0,0 +1,84 @@
+"""
+Сопоставление входящих TON со сделками
+
+Индекс ожидающих сделок строится один раз на опрос: по уникальному
+комментарию сделки (deal_<id>) и по точной сумме в nanoTON. Каждая
+транзакция находит свою сделку за O(1). Сумма используется только
+если она однозначна - две сделки с одинаковой суммой без комментария
+не получат чужой перевод.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from loguru import logger
+
+NANO = 1_000_000_000
+
+
+class PendingDeal(NamedTuple):
+    id: int
+    buyer_ton_address: str
+    ton_amount: float
+    user_id: int
+
+
+def deal_memo(deal_id: int) -> str:
+    """Комментарий, который продавец указывает в переводе"""
+    return f"deal_{deal_id}"
+
+
+def to_nano(amount_ton: float) -> int:
+    return int(round(amount_ton * NANO))
+
+
+class DepositMatcher:
+    """Индекс ожидающих сделок по комментарию и по точной сумме"""
+
+    def __init__(self, deals: Iterable[PendingDeal]):
+        self._by_memo: Dict[str, PendingDeal] = {}
+        self._by_nano: Dict[int, List[PendingDeal]] = {}
+        for deal in deals:
+            self._by_memo[deal_memo(deal.id)] = deal
+            self._by_nano.setdefault(to_nano(deal.ton_amount), []).append(deal)
+
+    def __len__(self) -> int:
+        return len(self._by_memo)
+
+    def match(self, tx: dict) -> Optional[PendingDeal]:
+        """
+        Находит сделку для входящей транзакции
+
+        Args:
+            tx: Транзакция pytonlib (in_msg.value, in_msg.message)
+
+        Returns:
+            PendingDeal или None
+        """
+        in_msg = tx.get("in_msg") or {}
+        value = int(in_msg.get("value") or 0)
+        if value <= 0:
+            return None
+
+        memo = (in_msg.get("message") or "").strip()
+        deal = self._by_memo.get(memo)
+        if deal is not None:
+            if value < to_nano(deal.ton_amount):
+                logger.warning(
+                    f"⚠️ Перевод по сделке {deal.id} меньше суммы: {value / NANO} < {deal.ton_amount} TON"
+                )
+                return None
+            return deal
+
+        candidates = self._by_nano.get(value, [])
+        if len(candidates) == 1:
+            return candidates[0]
+        if len(candidates) > 1:
+            logger.warning(
+                f"⚠️ Перевод {value / NANO} TON без комментария подходит к {len(candidates)} сделкам, пропущен"
+            )
+        return None
+
+    def consume(self, deal: PendingDeal):
+        """Убирает зачисленную сделку из индекса"""
+        self._by_memo.pop(deal_memo(deal.id), None)
+        same_amount = self._by_nano.get(to_nano(deal.ton_amount), [])
+        if deal in same_amount:
+            same_amount.remove(deal)
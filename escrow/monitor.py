@@ -1,83 +1,239 @@
+"""
+Мониторинг входящих TON на кошелёк бота
+
+Вместо пересканирования последних 30 транзакций каждые 15 секунд
+хранится курсор (lt/hash последней обработанной транзакции) и
+запрашиваются только более новые транзакции - постранично, сколько бы
+их ни пришло между опросами. Каждая транзакция обрабатывается в одной
+транзакции БД вместе со сдвигом курсора, поэтому ровно один раз.
+Выплата покупателю ставится в очередь (escrow.payouts) в той же
+транзакции БД и не задерживает разбор следующих транзакций.
+
+Интервал опроса подстраивается под активность, а внешний потоковый
+источник (websocket/SSE провайдера) может разбудить монитор досрочно
+через notify_new_transactions().
+"""
 import asyncio
+import base64
+from typing import List, Optional, Tuple
+from sqlalchemy import text
 from database.db import AsyncSessionLocal
-from database.models import Deal
-from escrow.ton_wallet import send_ton, get_ton_client, close_ton_client, BOT_WALLET_ADDRESS
+from database.models import TonCursor, Payout
+from database.stats import record_transition
+from escrow.ton_wallet import get_ton_client, close_ton_client
+from escrow.matching import NANO, DepositMatcher, PendingDeal, to_nano
+from escrow.payouts import payout_sequencer
+from bot.utils.error_handler import safe_send_message
 from loguru import logger
-from config import TONCENTER_API_KEY  # Не используется, но для совместимости
-from datetime import datetime, timezone
+from config import TON_POLL_MIN, TON_POLL_MAX, TON_PAGE_SIZE
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def notify_new_transactions():
+    """Будит монитор досрочно (для потокового источника транзакций)"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _tx_id(tx: dict) -> Tuple[int, str]:
+    """(lt, hash) транзакции"""
+    return int(tx["transaction_id"]["lt"]), tx["transaction_id"]["hash"]
+
+
+def _hash_to_hex(tx_hash: str) -> str:
+    """pytonlib принимает from_transaction_hash в hex, а отдаёт base64"""
+    return base64.b64decode(tx_hash).hex()
+
+
+async def load_cursor(address: str) -> Optional[TonCursor]:
+    async with AsyncSessionLocal() as db:
+        return await db.get(TonCursor, address)
+
+
+async def fetch_new_transactions(client, address: str, cursor_lt: Optional[int]) -> List[dict]:
+    """
+    Загружает транзакции новее курсора
+
+    Args:
+        client: TonlibClient
+        address: Адрес кошелька
+        cursor_lt: lt последней обработанной транзакции (None - первый запуск)
+
+    Returns:
+        Новые транзакции от старых к новым
+    """
+    collected: List[dict] = []
+    from_lt = from_hash = None
+
+    while True:
+        page = await client.get_transactions(
+            address,
+            from_transaction_lt=from_lt,
+            from_transaction_hash=from_hash,
+            to_transaction_lt=cursor_lt or 0,
+            limit=TON_PAGE_SIZE
+        )
+        full_page = len(page) >= TON_PAGE_SIZE
+
+        # Следующая страница начинается с последней транзакции предыдущей
+        if from_lt is not None:
+            page = [tx for tx in page if _tx_id(tx)[0] != from_lt]
+        collected.extend(page)
+
+        # Без курсора (первый запуск) не уходим вглубь истории
+        if not full_page or not page or cursor_lt is None:
+            break
+
+        from_lt, last_hash = _tx_id(page[-1])
+        from_hash = _hash_to_hex(last_hash)
+
+    # Курсор - граница: всё, что не новее него, уже обработано
+    if cursor_lt is not None:
+        collected = [tx for tx in collected if _tx_id(tx)[0] > cursor_lt]
+
+    collected.reverse()
+    return collected
+
+
+async def load_pending_deals() -> DepositMatcher:
+    """Строит индекс сделок, ожидающих TON (один запрос на опрос)"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            text(
+                "SELECT id, buyer_ton_address, ton_amount, user_id FROM deals "
+                "WHERE status = 'waiting_ton' AND expires_at > NOW()"
+            )
+        )
+        return DepositMatcher(PendingDeal(*row) for row in result.fetchall())
+
+
+async def process_transaction(bot, address: str, tx: dict, matcher: DepositMatcher):
+    """Обрабатывает одну транзакцию и сдвигает курсор в той же транзакции БД"""
+    lt, tx_hash = _tx_id(tx)
+    deal = matcher.match(tx)
+    payout = None
+    commission_nano = 0
+
+    async with AsyncSessionLocal() as db:
+        if deal is not None:
+            # Условное обновление: сделка ещё ждёт TON и этот хеш нигде не зачтён
+            result = await db.execute(
+                text(
+                    "UPDATE deals SET status = 'completed', ton_tx_hash = :tx_hash "
+                    "WHERE id = :deal_id AND status = 'waiting_ton' "
+                    "AND NOT EXISTS (SELECT 1 FROM deals WHERE ton_tx_hash = :tx_hash) "
+                    "RETURNING price_rub"
+                ),
+                {"tx_hash": tx_hash, "deal_id": deal.id}
+            )
+            price_rub = result.scalar()
+            if price_rub is not None:
+                await record_transition(db, "waiting_ton", "completed", turnover_rub=price_rub)
+
+                # Выплата покупателю (минус комиссия) - в той же транзакции, что и зачёт
+                amount_nano = to_nano(deal.ton_amount)
+                commission_nano = amount_nano // 100
+                payout = Payout(
+                    deal_id=deal.id,
+                    user_id=deal.user_id,
+                    to_address=deal.buyer_ton_address,
+                    amount_nano=amount_nano - commission_nano,
+                    comment=f"NaumHunterBot deal #{deal.id}"
+                )
+                db.add(payout)
+
+        cursor = await db.get(TonCursor, address)
+        if cursor is None:
+            cursor = TonCursor(address=address)
+            db.add(cursor)
+        cursor.last_lt = lt
+        cursor.last_hash = tx_hash
+        await db.commit()
+
+    if deal is not None:
+        matcher.consume(deal)
+
+    if payout is not None:
+        payout_sequencer.wake()
+
+        await safe_send_message(
+            bot,
+            payout.user_id,
+            f"✅ <b>Сделка #{payout.deal_id} завершена!</b>\n"
+            f"💰 К получению: {payout.amount_nano / NANO:.3f} TON (перевод в очереди)\n"
+            f"💎 Комиссия: {commission_nano / NANO:.3f} TON",
+            parse_mode="HTML"
+        )
+        logger.success(f"Сделка {payout.deal_id} завершена: +{commission_nano / NANO:.3f} TON")
+
+
+async def expire_deals():
+    """Автоотмена просроченных сделок"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            text("UPDATE deals SET status = 'timeout' WHERE status = 'waiting_ton' AND expires_at < NOW()")
+        )
+        await record_transition(db, "waiting_ton", "timeout", count=result.rowcount)
+        await db.commit()
+
 
 async def check_incoming_ton(bot):
-    """Мониторит входящие TON каждые 15 секунд с pytonlib"""
+    """Мониторит входящие TON с курсором и адаптивным интервалом опроса"""
+    global _wakeup
+
     client = await get_ton_client()
     if not client:
         logger.error("❌ Не удалось инициализировать TON client для мониторинга")
         return
-    
+
     logger.info("🔍 TonlibClient запущен для мониторинга")
-    
+    _wakeup = asyncio.Event()
+    interval = TON_POLL_MIN
+
     try:
         while True:
-        try:
-            # Получаем транзакции для BOT_WALLET_ADDRESS (из ton_wallet)
-            from escrow.ton_wallet import BOT_WALLET_ADDRESS
-            
-            if BOT_WALLET_ADDRESS.startswith("EQ_ERROR"):
-                logger.warning("⚠️ TON wallet недоступен, мониторинг пропущен")
-                await asyncio.sleep(60)
-                continue
-            
-            transactions = await client.get_transactions(
-                address=BOT_WALLET_ADDRESS,
-                limit=30
-            )
-            
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(
-                    "SELECT id, buyer_ton_address, ton_amount, user_id FROM deals "
-                    "WHERE status = 'waiting_ton' AND expires_at > NOW()"
-                )
-                active_deals = result.fetchall()
-                
-                for deal_row in active_deals:
-                    deal_id, buyer_address, ton_amount, user_id = deal_row
-                    
+            try:
+                # Получаем транзакции для BOT_WALLET_ADDRESS (из ton_wallet)
+                from escrow.ton_wallet import BOT_WALLET_ADDRESS
+
+                if BOT_WALLET_ADDRESS.startswith("EQ_ERROR"):
+                    logger.warning("⚠️ TON wallet недоступен, мониторинг пропущен")
+                    await asyncio.sleep(60)
+                    continue
+
+                cursor = await load_cursor(BOT_WALLET_ADDRESS)
+                cursor_lt = cursor.last_lt if cursor else None
+                transactions = await fetch_new_transactions(client, BOT_WALLET_ADDRESS, cursor_lt)
+
+                if transactions:
+                    matcher = await load_pending_deals()
                     for tx in transactions:
-                        if tx.get('in_msg', {}).get('value') and not tx.get('ton_tx_hash'):
-                            incoming_ton = int(tx['in_msg']['value']) / 1_000_000_000
-                            if abs(incoming_ton - ton_amount) < 0.05:
-                                # Совпадение!
-                                await db.execute(
-                                    "UPDATE deals SET status = 'completed', ton_tx_hash = :tx_hash "
-                                    "WHERE id = :deal_id",
-                                    {"tx_hash": tx['utime'], "deal_id": deal_id}
-                                )
-                                await db.commit()
-                                
-                                # Отправляем TON покупателю (минус комиссия)
-                                commission_ton = ton_amount * 0.01
-                                success = await send_ton(buyer_address, ton_amount - commission_ton)
-                                
-                                await bot.send_message(
-                                    user_id,
-                                    f"✅ <b>Сделка #{deal_id} завершена!</b>\n"
-                                    f"💰 Получено: {ton_amount - commission_ton:.3f} TON\n"
-                                    f"💎 Комиссия: {commission_ton:.3f} TON",
-                                    parse_mode="HTML"
-                                )
-                                logger.success(f"Сделка {deal_id} завершена: +{commission_ton:.3f} TON")
-                                break
-                
-                # Автоотмена
-                await db.execute(
-                    "UPDATE deals SET status = 'timeout' WHERE status = 'waiting_ton' AND expires_at < NOW()"
-                )
-                await db.commit()
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка мониторинга TON: {e}")
-        
-        await asyncio.sleep(15)
+                        await process_transaction(bot, BOT_WALLET_ADDRESS, tx, matcher)
+
+                await expire_deals()
+
+                # Есть активность - опрашиваем чаще, тишина - реже
+                if transactions:
+                    logger.info(f"📥 Обработано транзакций TON: {len(transactions)}")
+                    interval = TON_POLL_MIN
+                else:
+                    interval = min(interval * 1.5, TON_POLL_MAX)
+
+            except Exception as e:
+                logger.error(f"❌ Ошибка мониторинга TON: {e}")
+                interval = TON_POLL_MAX
+
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
     except KeyboardInterrupt:
         logger.info("Мониторинг TON остановлен")
+    except asyncio.CancelledError:
+        logger.info("Мониторинг TON остановлен")
+        raise
     finally:
-        await close_ton_client()
\ No newline at end of file
+        _wakeup = None
+        await close_ton_client()
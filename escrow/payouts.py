@@ -0,0 +1,169 @@
+"""
+Очередь выплат TON покупателям
+
+Выплата записывается в таблицу payouts в той же транзакции БД, в которой
+сделка зачтена, поэтому не теряется при падении бота. Отправкой владеет
+один секвенсор: он единственный читает seqno кошелька, складывает до
+PAYOUT_BATCH_SIZE выплат в одно внешнее сообщение v4r2 и не ждёт блока -
+подтверждение приходит на следующих тиках по сдвигу seqno.
+
+Почему повтор безопасен: выплаты помечаются 'sent' с seqno до отправки.
+Если seqno кошелька стал больше - сообщение применено. Если seqno не
+сдвинулся, а с отправки прошло больше PAYOUT_CONFIRM_TIMEOUT (дольше
+valid_until сообщения), оно уже не может быть применено, и выплаты
+возвращаются в очередь.
+"""
+import asyncio
+from typing import Optional
+from sqlalchemy import text
+from loguru import logger
+from database.db import AsyncSessionLocal
+from escrow.ton_wallet import (
+    MAX_MESSAGES_PER_TRANSFER, get_ton_client, get_wallet_seqno,
+    build_batch_transfer, send_boc, wallet_ready
+)
+from escrow.matching import NANO
+from bot.utils.notifier import notifier, PRIORITY_PREMIUM
+from config import PAYOUT_BATCH_SIZE, PAYOUT_INTERVAL, PAYOUT_CONFIRM_TIMEOUT, PAYOUT_MAX_ATTEMPTS
+
+
+class PayoutSequencer:
+    """Единственный отправитель исходящих переводов кошелька бота"""
+
+    def __init__(self, batch_size: int, interval: float, confirm_timeout: float, max_attempts: int):
+        self.batch_size = max(1, min(batch_size, MAX_MESSAGES_PER_TRANSFER))
+        self.interval = interval
+        self.confirm_timeout = confirm_timeout
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def wake(self):
+        """Будит секвенсор после постановки выплаты в очередь"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _settle(self, db, seqno: int):
+        """Подтверждает применённые сообщения и возвращает в очередь истёкшие"""
+        result = await db.execute(
+            text(
+                "UPDATE payouts SET status = 'confirmed', confirmed_at = NOW() "
+                "WHERE status = 'sent' AND seqno < :seqno "
+                "RETURNING deal_id, user_id, amount_nano"
+            ),
+            {"seqno": seqno}
+        )
+        confirmed = result.fetchall()
+
+        result = await db.execute(
+            text(
+                "UPDATE payouts SET seqno = NULL, "
+                "status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END "
+                "WHERE status = 'sent' AND seqno >= :seqno "
+                "AND sent_at < NOW() - make_interval(secs => :timeout) "
+                "RETURNING deal_id, status"
+            ),
+            {"seqno": seqno, "timeout": self.confirm_timeout, "max_attempts": self.max_attempts}
+        )
+        for deal_id, status in result.fetchall():
+            if status == "failed":
+                logger.error(f"❌ Выплата по сделке {deal_id} не доставлена за {self.max_attempts} попыток")
+            else:
+                logger.warning(f"⚠️ Выплата по сделке {deal_id} не подтверждена, повторная отправка")
+
+        return confirmed
+
+    async def tick(self):
+        """Один шаг: подтвердить отправленное и, если ничего не в полёте, отправить пачку"""
+        client = await get_ton_client()
+        if not client:
+            return
+
+        seqno = await get_wallet_seqno(client)
+
+        async with AsyncSessionLocal() as db:
+            confirmed = await self._settle(db, seqno)
+
+            # Пока предыдущее сообщение не применено, следующий seqno подписать нельзя
+            in_flight = (await db.execute(
+                text("SELECT 1 FROM payouts WHERE status = 'sent' LIMIT 1")
+            )).first()
+
+            batch = []
+            if in_flight is None:
+                result = await db.execute(
+                    text(
+                        "SELECT id, to_address, amount_nano, comment FROM payouts "
+                        "WHERE status = 'pending' ORDER BY id LIMIT :limit FOR UPDATE SKIP LOCKED"
+                    ),
+                    {"limit": self.batch_size}
+                )
+                batch = result.fetchall()
+                if batch:
+                    await db.execute(
+                        text(
+                            "UPDATE payouts SET status = 'sent', seqno = :seqno, sent_at = NOW(), "
+                            "attempts = attempts + 1 WHERE id = ANY(:ids)"
+                        ),
+                        {"seqno": seqno, "ids": [row.id for row in batch]}
+                    )
+            await db.commit()
+
+        for deal_id, user_id, amount_nano in confirmed:
+            logger.success(f"💸 Выплата по сделке {deal_id} подтверждена: {amount_nano / NANO:.3f} TON")
+            notifier.enqueue(
+                user_id,
+                f"💸 <b>TON по сделке #{deal_id} доставлены</b>\n"
+                f"💰 Сумма: {amount_nano / NANO:.3f} TON",
+                PRIORITY_PREMIUM,
+                parse_mode="HTML"
+            )
+
+        if not batch:
+            return
+
+        # Отправка после коммита: статус 'sent' уже записан вместе с seqno
+        boc = build_batch_transfer(
+            [(row.to_address, row.amount_nano, row.comment or "") for row in batch],
+            seqno
+        )
+        if await send_boc(client, boc):
+            logger.info(f"📤 Отправлено выплат: {len(batch)} (seqno {seqno})")
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"❌ Ошибка очереди выплат: {e}")
+
+            # Ждём следующий блок или новую выплату
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        """Запускает секвенсор (вызывается в on_startup)"""
+        if self._task:
+            return
+        if not wallet_ready():
+            logger.warning("⚠️ TON wallet недоступен, очередь выплат не запущена")
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"✅ Очередь выплат запущена (до {self.batch_size} переводов в сообщении)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._wakeup = None
+
+
+payout_sequencer = PayoutSequencer(PAYOUT_BATCH_SIZE, PAYOUT_INTERVAL, PAYOUT_CONFIRM_TIMEOUT, PAYOUT_MAX_ATTEMPTS)
@@ -0,0 +1,125 @@
+"""
+Сверка оплат YooMoney
+
+Раз в PAYMENT_RECONCILE_INTERVAL секунд история операций запрашивается
+одним вызовом (с момента самой старой ожидающей сделки) и сопоставляется
+со всеми сделками в статусе waiting_payment по метке deal_<id>.
+Оплаченные сделки переводятся дальше автоматически: пользователь
+получает сообщение и FSM-состояние ожидания TON-адреса. Кнопка
+"✅ Я оплатил" остаётся как ручная проверка.
+"""
+import asyncio
+from datetime import timedelta
+from typing import Optional
+from aiogram import Bot
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from sqlalchemy import text
+from loguru import logger
+from database.db import AsyncSessionLocal
+from database.stats import record_transition
+from escrow.yoomoney import fetch_paid_labels
+from bot.states import DealStates
+from bot.utils.notifier import notifier, PRIORITY_PREMIUM
+from bot.utils.logging_setup import log_deal_status_changed, log_payment_received
+from config import PAYMENT_RECONCILE_INTERVAL
+
+# Запас на расхождение часов YooMoney и БД
+LOOKBACK_MARGIN = timedelta(minutes=10)
+
+PAID_TEXT = (
+    "✅ <b>ОПЛАТА ПОЛУЧЕНА!</b>\n\n"
+    "📱 Теперь отправь свой TON-адрес для получения криптовалюты\n"
+    "Пример: <code>EQAbc...xyz123</code>"
+)
+
+
+class PaymentReconciler:
+    """Фоновое подтверждение оплат по истории операций YooMoney"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._bot: Optional[Bot] = None
+        self._storage: Optional[BaseStorage] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def reconcile(self) -> int:
+        """
+        Одна сверка всех ожидающих оплаты сделок
+
+        Returns:
+            Количество подтвержденных сделок
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text("SELECT id, updated_at FROM deals WHERE status = 'waiting_payment'")
+            )
+            waiting = result.fetchall()
+        if not waiting:
+            return 0
+
+        since = min(updated_at for _, updated_at in waiting) - LOOKBACK_MARGIN
+        paid_labels = await fetch_paid_labels(since)
+        paid_ids = [deal_id for deal_id, _ in waiting if f"deal_{deal_id}" in paid_labels]
+        if not paid_ids:
+            return 0
+
+        # Условный переход: сделку могли уже подтвердить кнопкой или отменить
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text(
+                    "UPDATE deals SET status = 'waiting_ton_address', updated_at = NOW() "
+                    "WHERE id = ANY(:ids) AND status = 'waiting_payment' "
+                    "RETURNING id, user_id, price_rub"
+                ),
+                {"ids": paid_ids}
+            )
+            advanced = result.fetchall()
+            await record_transition(db, "waiting_payment", "waiting_ton_address", count=len(advanced))
+            await db.commit()
+
+        for deal_id, user_id, price_rub in advanced:
+            log_payment_received(deal_id, price_rub)
+            log_deal_status_changed(deal_id, "waiting_payment", "waiting_ton_address")
+            await self._ask_ton_address(deal_id, user_id)
+
+        return len(advanced)
+
+    async def _ask_ton_address(self, deal_id: int, user_id: int):
+        """Ставит пользователю состояние ожидания TON-адреса и пишет ему"""
+        if self._bot is not None and self._storage is not None:
+            key = StorageKey(bot_id=self._bot.id, chat_id=user_id, user_id=user_id)
+            await self._storage.set_state(key, DealStates.waiting_for_ton_address)
+            await self._storage.update_data(key, {"deal_id": deal_id})
+
+        notifier.enqueue(user_id, PAID_TEXT, PRIORITY_PREMIUM, parse_mode="HTML")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                confirmed = await self.reconcile()
+                if confirmed:
+                    logger.info(f"💳 Сверка оплат: подтверждено сделок {confirmed}")
+            except Exception as e:
+                logger.error(f"❌ Ошибка сверки оплат YooMoney: {e}")
+
+    def start(self, bot: Bot, storage: BaseStorage):
+        """Запускает фоновую сверку (вызывается в on_startup)"""
+        if self._task:
+            return
+        self._bot = bot
+        self._storage = storage
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"✅ Сверка оплат YooMoney запущена (каждые {self.interval:.0f}с)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+payment_reconciler = PaymentReconciler(PAYMENT_RECONCILE_INTERVAL)
@@ -1,14 +1,16 @@
 """
 Оптимизированный модуль для работы с TON кошельком
 """
+from tonsdk.boc import Cell
+from tonsdk.contract import Contract
 from tonsdk.contract.wallet import Wallets, WalletVersionEnum
-from tonsdk.utils import to_nano
+from tonsdk.utils import Address, to_nano
 from pytonlib import TonlibClient
 from config import TONCENTER_API_KEY, MNEMONIC
 from loguru import logger
 import requests
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 # Глобальные переменные для ленивой инициализации
 _ton_client: Optional[TonlibClient] = None
@@ -16,6 +18,11 @@ _wallet = None
 _privkey = None
 BOT_WALLET_ADDRESS = "NOT_INITIALIZED"
 
+# Сколько исходящих сообщений wallet v4r2 принимает в одном внешнем сообщении
+MAX_MESSAGES_PER_TRANSFER = 4
+# Режим отправки: комиссия сверху, ошибки одного перевода не отменяют остальные
+SEND_MODE = 3
+
 
 def init_wallet_sync():
     """
@@ -94,7 +101,10 @@ async def close_ton_client():
 
 async def send_ton(to_address: str, amount_ton: float, comment: str = "NaumHunterBot") -> bool:
     """
-    Отправляет TON через pytonlib
+    Отправляет TON через pytonlib (разовый перевод вне очереди)
+
+    Выплаты по сделкам идут через escrow.payouts: там seqno
+    принадлежит одному секвенсору и переводы не конкурируют.
     
     Args:
         to_address: Адрес получателя
@@ -146,6 +156,64 @@ async def send_ton(to_address: str, amount_ton: float, comment: str = "NaumHunte
         return False
 
 
+async def get_wallet_seqno(client: TonlibClient) -> int:
+    """
+    Текущий seqno кошелька бота (get-метод seqno)
+
+    Args:
+        client: TonlibClient
+
+    Returns:
+        seqno (0 для неразвёрнутого кошелька)
+    """
+    result = await client.raw_run_method(BOT_WALLET_ADDRESS, "seqno", [])
+    if result.get("exit_code", 0) != 0 or not result.get("stack"):
+        return 0
+    return int(result["stack"][0][1], 16)
+
+
+def build_batch_transfer(messages: List[Tuple[str, int, str]], seqno: int) -> bytes:
+    """
+    Собирает одно внешнее сообщение с несколькими переводами
+
+    Args:
+        messages: Переводы (адрес, сумма в nanoTON, комментарий), не больше MAX_MESSAGES_PER_TRANSFER
+        seqno: seqno, под которым сообщение будет подписано
+
+    Returns:
+        BOC подписанного сообщения
+    """
+    if not 0 < len(messages) <= MAX_MESSAGES_PER_TRANSFER:
+        raise ValueError(f"В одном переводе от 1 до {MAX_MESSAGES_PER_TRANSFER} сообщений")
+
+    signing_message = _wallet.create_signing_message(seqno)
+    for to_address, amount_nano, comment in messages:
+        payload = Cell()
+        payload.bits.write_uint(0, 32)
+        payload.bits.write_string(comment)
+
+        header = Contract.create_internal_message_header(Address(to_address), amount_nano)
+        signing_message.bits.write_uint8(SEND_MODE)
+        signing_message.refs.append(Contract.create_common_msg_info(header, None, payload))
+
+    query = _wallet.create_external_message(signing_message, seqno)
+    return query["message"].to_boc(False)
+
+
+async def send_boc(client: TonlibClient, boc: bytes) -> bool:
+    """Отправляет подписанное сообщение в сеть"""
+    try:
+        await client.raw_send_message(boc)
+        return True
+    except Exception as e:
+        logger.error(f"❌ Ошибка отправки сообщения в сеть TON: {e}")
+        return False
+
+
+def wallet_ready() -> bool:
+    return bool(_wallet) and not BOT_WALLET_ADDRESS.startswith("EQ_ERROR")
+
+
 async def get_wallet_balance() -> float:
     """
     Получает баланс кошелька бота
@@ -1,52 +1,148 @@
-from yoomoney import Client
-from config import YOOMONEY_TOKEN
+"""
+Платёжный шлюз YooMoney
+
+HTTP API YooMoney вызывается напрямую через общую aiohttp-сессию
+(parser.http_client) с таймаутом YOOMONEY_TIMEOUT на весь запрос.
+Синхронная библиотека yoomoney ходила в API через requests без
+таймаута сокета: asyncio.wait_for отпускал хендлер, но зависший запрос
+продолжал занимать поток пула, и после нескольких таких запросов
+проверки оплат вставали в очередь за ними.
+
+Ссылка на оплату (форма quickpay) собирается локально - это
+GET-ссылка на форму YooMoney, запрос к API для неё не нужен.
+"""
+import asyncio
+from datetime import datetime
+from typing import Optional, Set
+from urllib.parse import urlencode
+from parser.http_client import post_form
+from config import YOOMONEY_TOKEN, YOOMONEY_WALLET, YOOMONEY_TIMEOUT
 from loguru import logger
 
-if YOOMONEY_TOKEN:
-    client = Client(YOOMONEY_TOKEN)
-else:
+API_URL = "https://yoomoney.ru/api"
+QUICKPAY_URL = "https://yoomoney.ru/quickpay/confirm.xml"
+
+if not YOOMONEY_TOKEN:
     logger.error("❌ YOOMONEY_TOKEN не настроен!")
-    client = None
 
-def create_payment(amount: float, deal_id: int) -> dict:
+
+class YooMoneyError(RuntimeError):
+    """API YooMoney вернул ошибку"""
+
+
+async def _call(method: str, **params) -> dict:
+    """
+    Вызывает метод HTTP API YooMoney
+
+    Args:
+        method: Метод API (operation-history, ...)
+        **params: Параметры запроса; None пропускаются
+
+    Returns:
+        Ответ API
+
+    Raises:
+        asyncio.TimeoutError: YooMoney не ответил за YOOMONEY_TIMEOUT
+        aiohttp.ClientError: сетевая ошибка или HTTP-статус ошибки
+        YooMoneyError: API вернул поле error
+    """
+    data = await post_form(
+        f"{API_URL}/{method}",
+        {key: value for key, value in params.items() if value is not None},
+        headers={"Authorization": f"Bearer {YOOMONEY_TOKEN}"},
+        timeout=YOOMONEY_TIMEOUT
+    )
+    if "error" in data:
+        raise YooMoneyError(data["error"])
+    return data
+
+
+async def _operation_history(
+    label: Optional[str] = None,
+    type: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    start_record: Optional[str] = None,
+    records: Optional[int] = None
+) -> dict:
+    """Страница истории операций кошелька"""
+    return await _call(
+        "operation-history",
+        label=label,
+        type=type,
+        from_date=f"{from_date:%Y-%m-%dT%H:%M:%S}" if from_date else None,
+        start_record=start_record,
+        records=records
+    )
+
+
+async def create_payment(amount: float, deal_id: int) -> dict:
     """Создает платежную ссылку"""
-    if not client:
-        return {"url": "", "payment_id": f"error_{deal_id}"}
-        
-    try:
-        from config import YOOMONEY_WALLET
-        payment = client.create_payment(
-            to=YOOMONEY_WALLET,  # Используй кошелек из .env
-            amount=amount,
-            label=f"deal_{deal_id}",
-            quickpay_form="shop",
-            targets="Покупка TON через NaumHunterBot",
-            successURL="https://t.me/NaumHunterBot",
-            payment_type="PC"
-        )
-        logger.info(f"💳 Создана оплата #{deal_id}: {amount} ₽")
-        return {
-            "url": payment.confirmation.confirmation_url,
-            "payment_id": payment.id
-        }
-    except Exception as e:
-        logger.error(f"❌ Ошибка создания платежа: {e}")
+    if not YOOMONEY_TOKEN:
         return {"url": "", "payment_id": f"error_{deal_id}"}
 
-def check_payment(payment_id: str) -> bool:
+    label = f"deal_{deal_id}"
+    url = f"{QUICKPAY_URL}?" + urlencode({
+        "receiver": YOOMONEY_WALLET,  # Используй кошелек из .env
+        "quickpay-form": "shop",
+        "targets": "Покупка TON через NaumHunterBot",
+        "paymentType": "PC",
+        "sum": amount,
+        "label": label,
+        "successURL": "https://t.me/NaumHunterBot",
+    })
+    logger.info(f"💳 Создана оплата #{deal_id}: {amount} ₽")
+    return {"url": url, "payment_id": label}
+
+async def check_payment(payment_id: str) -> bool:
     """Проверяет статус платежа"""
-    if not client:
+    if not YOOMONEY_TOKEN:
         return False
-        
+
     try:
         deal_id = payment_id.split('_')[-1] if '_' in payment_id else payment_id
-        history = client.operation_history(label=f"deal_{deal_id}")
-        
-        for operation in history.operations:
-            if operation.status == "success":
+        history = await _operation_history(label=f"deal_{deal_id}")
+
+        for operation in history.get("operations", []):
+            if operation.get("status") == "success":
                 logger.info(f"✅ Платеж #{deal_id} подтвержден")
                 return True
         return False
+    except asyncio.TimeoutError:
+        logger.error(f"❌ YooMoney не ответил за {YOOMONEY_TIMEOUT:.0f}с при проверке платежа {payment_id}")
+        return False
     except Exception as e:
         logger.error(f"❌ Ошибка проверки платежа {payment_id}: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+async def fetch_paid_labels(since: datetime, max_pages: int = 10) -> Set[str]:
+    """
+    Метки успешных входящих платежей одним проходом по истории
+
+    Args:
+        since: Начало периода
+        max_pages: Ограничение на число страниц истории
+
+    Returns:
+        Множество меток (deal_<id>) подтвержденных платежей
+    """
+    if not YOOMONEY_TOKEN:
+        return set()
+
+    labels: Set[str] = set()
+    start_record = None
+    for _ in range(max_pages):
+        history = await _operation_history(
+            type="deposition",
+            from_date=since,
+            start_record=start_record,
+            records=100
+        )
+        for operation in history.get("operations", []):
+            if operation.get("status") == "success" and operation.get("label"):
+                labels.add(operation["label"])
+
+        start_record = history.get("next_record")
+        if not start_record:
+            break
+    return labels
@@ -1,27 +1,40 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from loguru import logger
-from config import BOT_TOKEN
+from config import BOT_TOKEN, BOT_MODE
 from bot.utils.error_handler import validate_env_variables, handle_errors
 from bot.utils.logging_setup import setup_logging
+from bot.utils.notifier import notifier
+from bot.utils.fsm_storage import create_fsm_storage
+from bot.middlewares.user import UserMiddleware
+from bot.webhook import run_webhook
+from bot.utils.subscriptions import warm_subscriptions
 from database.db import engine, Base
-from parser.avito_parser import start_avito_parser
-from parser.yula_parser import start_yula_parser
+from database.stats import rebuild_stats_if_empty
+from database.schema import upgrade_schema
+from parser.avito_parser import avito_source
+from parser.yula_parser import yula_source
+from parser.http_client import init_http_client, close_http_client
+from parser.seen_index import warm_seen_index
+from parser.cursors import scrape_cursors
+from parser.scheduler import scrape_scheduler
+from parser.ton_price import price_oracle
+from scam_check.blacklist import seller_blacklist
 from escrow.monitor import check_incoming_ton
+from escrow.payouts import payout_sequencer
+from escrow.reconciler import payment_reconciler
 from bot.handlers.admin import router as admin_router
 from bot.handlers.deals import router as deals_router
 from bot.handlers.premium import router as premium_router
 from bot.handlers.setting import router as setting_router
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # Настройка логирования
 setup_logging()
 logging.basicConfig(level=logging.INFO)
 
 bot = Bot(token=BOT_TOKEN, parse_mode="HTML")
-storage = MemoryStorage()
+storage = create_fsm_storage()
 dp = Dispatcher(storage=storage)
 
 async def on_startup():
@@ -37,15 +50,42 @@ async def on_startup():
     # Создание таблиц БД
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # Ограничения, которых create_all не добавит в существующие таблицы
+        await upgrade_schema(conn)
     logger.info("✅ База данных готова")
     
+    # Агрегаты админ-статистики (пересборка только на пустой таблице)
+    await rebuild_stats_if_empty()
+    
+    # Индекс уже найденных объявлений
+    await warm_seen_index()
+    
+    # Курсоры выдачи: с какого объявления продолжать каждый запрос
+    await scrape_cursors.warm()
+    
+    # Черный список продавцов
+    await seller_blacklist.start()
+    
+    # Фильтры пользователей для рассылки сделок
+    await warm_subscriptions()
+    
+    # Общий HTTP клиент для парсеров и курса TON
+    await init_http_client()
+    
+    # Курс TON/RUB обновляется в фоне
+    await price_oracle.start()
+    
+    # Очередь уведомлений
+    notifier.start(bot)
+    
     # Планировщик парсинга
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(start_avito_parser, "interval", minutes=3, args=[bot])
-    scheduler.add_job(start_yula_parser, "interval", minutes=5, args=[bot])
-    scheduler.start()
-    logger.info("✅ Парсер Avito запущен (каждые 3 мин)")
-    logger.info("✅ Парсер Юлы запущен (каждые 5 мин)")
+    scrape_scheduler.start([avito_source, yula_source])
+    
+    # Очередь выплат TON (единственный владелец seqno кошелька)
+    payout_sequencer.start()
+    
+    # Фоновая сверка оплат YooMoney
+    payment_reconciler.start(bot, storage)
     
     # Мониторинг TON
     asyncio.create_task(check_incoming_ton(bot))
@@ -53,7 +93,22 @@ async def on_startup():
     
     logger.info("✅ Бот полностью готов к работе!")
 
+async def on_shutdown():
+    logger.info("🛑 NaumHunterBot останавливается...")
+    await scrape_scheduler.stop()
+    await payment_reconciler.stop()
+    await payout_sequencer.stop()
+    await notifier.stop()
+    await seller_blacklist.stop()
+    await price_oracle.stop()
+    await close_http_client()
+    await storage.close()
+
 async def main():
+    # Пользователь из кеша для хендлеров и фильтров (до фильтров - outer)
+    dp.message.outer_middleware(UserMiddleware())
+    dp.callback_query.outer_middleware(UserMiddleware())
+    
     # Подключаем роутеры
     dp.include_router(deals_router)
     dp.include_router(admin_router)
@@ -61,7 +116,13 @@ async def main():
     dp.include_router(setting_router)
     
     await on_startup()
-    await dp.start_polling(bot)
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await on_shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
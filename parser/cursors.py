@@ -0,0 +1,199 @@
+"""
+Курсоры поисковой выдачи: инкрементальный обход "сначала новые"
+
+Для каждого (источник, запрос) хранится верхняя граница уже
+просмотренной выдачи: самое свежее объявление, его время и ID с верха
+прошлой выдачи. Выдача запрашивается с сортировкой по дате и листается,
+пока на странице нет уже виденных объявлений: в спокойное время это одна
+страница за тик, при наплыве новых - глубже, до SCRAPE_MAX_PAGES.
+
+Курсор сдвигается, когда новая часть выдачи просмотрена: дошли до уже
+виденного объявления или до конца выдачи. Если страница не загрузилась
+(PageFetchError), курсор остаётся прежним - иначе объявления на
+непрочитанных страницах оказались бы ниже границы и пропали навсегда;
+прочитанные объявления обрабатываются, в следующий тик они придут снова
+и отсеются дедупликацией сделок.
+
+Если новые не кончились за SCRAPE_MAX_PAGES страниц (наплыв, простой
+бота), курсор всё равно сдвигается на верх выдачи, а объявления глубже
+лимита считаются пропущенными (в лог - предупреждение с размером
+разрыва). Иначе разрыв не закрылся бы никогда: каждый тик перечитывал бы
+те же страницы и выдавал их как новые, завышая темп для планировщика.
+
+Сдвиг держится в памяти и пишется в БД одним upsert после сохранения
+найденных сделок (commit); при ошибке прохода - discard(), и следующий
+тик пересмотрит ту же выдачу.
+"""
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database.db import AsyncSessionLocal
+from database.models import ScrapeCursor
+from parser.extractors import ListingRecord
+from parser.seen_index import seen_index
+from parser.sources import PageFetchError
+from config import SCRAPE_MAX_PAGES
+
+# Сколько ID с верха выдачи помнить (закреплённые и поднятые объявления)
+RECENT_IDS = 200
+# Объявления старше границы на столько считаются виденными даже без ID
+# (у Avito время публикации приблизительное: "2 часа назад")
+TIME_SLACK = timedelta(hours=1)
+
+Key = Tuple[str, str]
+
+
+@dataclass
+class QueryCursor:
+    """Граница просмотренной выдачи одного запроса"""
+    last_item_id: Optional[str] = None
+    last_posted_at: Optional[datetime] = None
+    recent_ids: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.last_item_id is None
+
+    def is_seen(self, record: ListingRecord) -> bool:
+        if record.item_id in self.recent_ids or record.item_id in seen_index:
+            return True
+        return bool(
+            record.posted_at and self.last_posted_at
+            and record.posted_at < self.last_posted_at - TIME_SLACK
+        )
+
+    def advanced(self, records: List[ListingRecord]) -> "QueryCursor":
+        """Новая граница после просмотра records (свежие первыми)"""
+        if not records:
+            return self
+        recent = list(dict.fromkeys(record.item_id for record in records))
+        scanned = set(recent)
+        recent += [item_id for item_id in self.recent_ids if item_id not in scanned]
+        posted = [record.posted_at for record in records if record.posted_at]
+        last_posted_at = max(posted + ([self.last_posted_at] if self.last_posted_at else []), default=None)
+        return QueryCursor(records[0].item_id, last_posted_at, recent[:RECENT_IDS])
+
+
+class ScrapeCursors:
+    """Курсоры всех запросов с отложенной записью в БД"""
+
+    def __init__(self, max_pages: int):
+        self.max_pages = max_pages
+        self._cursors: Dict[Key, QueryCursor] = {}
+        self._pending: Dict[Key, QueryCursor] = {}
+
+    def get(self, source: str, query: str) -> QueryCursor:
+        key = (source, query)
+        return self._pending.get(key) or self._cursors.get(key) or QueryCursor()
+
+    async def scan(
+        self,
+        source: str,
+        query: str,
+        fetch_page: Callable[[int], Awaitable[List[ListingRecord]]]
+    ) -> List[ListingRecord]:
+        """
+        Новые объявления запроса с ранней остановкой
+
+        Args:
+            source: Источник (avito, yula)
+            query: Поисковый запрос
+            fetch_page: Загрузка страницы выдачи по номеру (с 1), свежие первыми;
+                PageFetchError - страница не загрузилась
+
+        Returns:
+            Объявления, которых не было в прошлых проходах
+        """
+        cursor = self.get(source, query)
+        fresh: List[ListingRecord] = []
+        scanned: List[ListingRecord] = []
+        complete = False
+
+        for page in range(1, self.max_pages + 1):
+            try:
+                records = await fetch_page(page)
+            except PageFetchError as e:
+                logger.warning(f"⚠️ {source} '{query}': стр. {page} не загрузилась, курсор не сдвигаю ({e})")
+                break
+            if not records:
+                complete = True
+                break
+            scanned.extend(records)
+            fresh.extend(record for record in records if not cursor.is_seen(record))
+
+            # Первый проход - только первая страница, а не вся история;
+            # дальше листаем, пока самое старое на странице ещё не видели
+            if cursor.is_empty or cursor.is_seen(records[-1]):
+                complete = True
+                break
+        else:
+            # Разрыв не закрыть: принимаем его, иначе тики застрянут на тех же страницах
+            complete = True
+            gap_from = cursor.last_posted_at.isoformat() if cursor.last_posted_at else cursor.last_item_id
+            logger.warning(
+                f"⚠️ {source} '{query}': новые объявления глубже {self.max_pages} стр., "
+                f"пропущены объявления старше {scanned[-1].item_id} до прежней границы {gap_from}"
+            )
+
+        if complete and scanned:
+            self._pending[(source, query)] = cursor.advanced(scanned)
+        return fresh
+
+    async def commit(self, source: str):
+        """Записывает сдвинутые курсоры источника в БД одним upsert"""
+        keys = [key for key in self._pending if key[0] == source]
+        if not keys:
+            return
+
+        rows = [
+            {
+                "source": key[0],
+                "query": key[1],
+                "last_item_id": self._pending[key].last_item_id,
+                "last_posted_at": self._pending[key].last_posted_at,
+                "recent_ids": json.dumps(self._pending[key].recent_ids),
+                "updated_at": datetime.utcnow(),
+            }
+            for key in keys
+        ]
+        stmt = pg_insert(ScrapeCursor).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ScrapeCursor.source, ScrapeCursor.query],
+            set_={
+                "last_item_id": stmt.excluded.last_item_id,
+                "last_posted_at": stmt.excluded.last_posted_at,
+                "recent_ids": stmt.excluded.recent_ids,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+        for key in keys:
+            self._cursors[key] = self._pending.pop(key)
+
+    def discard(self, source: str):
+        """Отменяет несохранённые сдвиги (проход завершился ошибкой)"""
+        for key in [key for key in self._pending if key[0] == source]:
+            del self._pending[key]
+
+    async def warm(self):
+        """Загружает курсоры из БД (вызывается в on_startup)"""
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(ScrapeCursor))
+                for row in result.scalars():
+                    self._cursors[(row.source, row.query)] = QueryCursor(
+                        row.last_item_id, row.last_posted_at, json.loads(row.recent_ids or "[]")
+                    )
+            logger.info(f"✅ Курсоры выдачи загружены: {len(self._cursors)}")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки курсоров выдачи: {e}")
+
+
+scrape_cursors = ScrapeCursors(SCRAPE_MAX_PAGES)
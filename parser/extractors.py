@@ -0,0 +1,480 @@
+"""
+Извлечение объявлений из страниц выдачи
+
+Страница разбирается потоково: HTML подаётся кусками в feed(), готовые
+объявления возвращаются сразу, без копии всей страницы в памяти и без
+зависимости от порядка атрибутов. Источники объявлений:
+
+- встроенное JSON-состояние страницы (window.__initialData__ или
+  <script data-mfe-state>), откуда берутся все поля выдачи;
+- разметка карточек (data-marker="item" и вложенные item-title,
+  item-price, item-address, item-date) - если JSON на странице нет
+  или он идёт после карточек.
+
+Одно объявление, найденное обоими способами, отдаётся один раз.
+Новый источник подключается подклассом ListingExtractor в EXTRACTORS.
+"""
+import html
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import unquote, urljoin
+
+AVITO_BASE_URL = "https://www.avito.ru"
+
+# Маркеры полей внутри карточки Avito -> поле ListingRecord
+AVITO_FIELD_MARKERS = {
+    "item-title": "title",
+    "item-price": "price",
+    "item-address": "city",
+    "item-location": "city",
+    "item-date": "posted",
+    "item-seller": "seller",
+    "seller-info/name": "seller",
+}
+
+_INITIAL_DATA_RE = re.compile(r'__initialData__\s*=\s*"((?:[^"\\]|\\.)*)"')
+_ITEM_ID_RE = re.compile(r"_(\d+)/?$")
+_RELATIVE_DATE_RE = re.compile(r"(\d+)\s+(минут|час|дн|день|недел)")
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})")
+
+_TAG_RE = re.compile(r"""<(/?)([a-zA-Z][^\s/>]*)((?:[^>"']|"[^"]*"|'[^']*')*)>""")
+_ATTR_RE = re.compile(r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_MAX_TAG_LENGTH = 8192
+_RAW_TEXT_TAGS = frozenset({"script", "style"})
+
+# Для отслеживания вложенности: у этих тегов не бывает закрывающих
+_VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+})
+
+
+@dataclass
+class ListingRecord:
+    """Объявление со страницы выдачи"""
+    item_id: str
+    url: str
+    title: str
+    price_rub: Optional[float] = None
+    seller: Optional[str] = None
+    city: Optional[str] = None
+    posted_at: Optional[datetime] = None
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """
+    Цена из числа или строки вида "12 000 ₽"
+
+    Returns:
+        Цена в рублях или None
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    digits = re.sub(r"[^\d,.]", "", str(value)).replace(",", ".")
+    try:
+        return float(digits) if digits else None
+    except ValueError:
+        return None
+
+
+def parse_posted_at(text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Время публикации из подписи карточки ("5 минут назад", "вчера 14:30")
+
+    Args:
+        text: Подпись даты
+        now: Текущее время (UTC)
+
+    Returns:
+        Время в UTC или None, если формат не распознан
+    """
+    now = now or datetime.now(timezone.utc)
+    text = text.strip().lower()
+
+    match = _RELATIVE_DATE_RE.search(text)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        if unit == "минут":
+            return now - timedelta(minutes=amount)
+        if unit == "час":
+            return now - timedelta(hours=amount)
+        if unit == "недел":
+            return now - timedelta(weeks=amount)
+        return now - timedelta(days=amount)
+
+    if text.startswith(("сегодня", "вчера")):
+        day = now if text.startswith("сегодня") else now - timedelta(days=1)
+        time_match = _TIME_RE.search(text)
+        if time_match:
+            return day.replace(hour=int(time_match.group(1)), minute=int(time_match.group(2)),
+                               second=0, microsecond=0)
+        return day
+    return None
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Unix-время в секундах или миллисекундах"""
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+        return None
+    if value > 1e11:
+        value /= 1000
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+class ListingExtractor:
+    """
+    Базовый потоковый извлекатель объявлений
+
+    Лёгкий токенизатор HTML: теги находятся одним регулярным выражением,
+    атрибуты разбираются только там, где они нужны подклассу, текст
+    передаётся в handle_data() только пока collect_text истинно.
+    Незаконченный на границе куска тег ждёт следующего feed().
+
+    Подклассы реализуют handle_starttag(tag, raw_attrs),
+    handle_endtag(tag), handle_data(text), handle_rawdata(text) (тело
+    script/style) и сообщают объявления через _emit(); feed() и close()
+    возвращают объявления, готовые к этому моменту.
+    """
+
+    collect_text = False
+
+    def __init__(self):
+        self._buffer = ""
+        self._raw_tag: Optional[str] = None
+        self._ready: List[ListingRecord] = []
+        self._emitted: Set[str] = set()
+
+    def handle_starttag(self, tag: str, raw_attrs: str):
+        pass
+
+    def handle_endtag(self, tag: str):
+        pass
+
+    def handle_data(self, text: str):
+        pass
+
+    def handle_rawdata(self, text: str):
+        pass
+
+    def _emit(self, record: Optional[ListingRecord]):
+        if record is None or not record.item_id or record.item_id in self._emitted:
+            return
+        self._emitted.add(record.item_id)
+        self._ready.append(record)
+
+    def _drain(self) -> List[ListingRecord]:
+        ready, self._ready = self._ready, []
+        return ready
+
+    def feed(self, data: str) -> List[ListingRecord]:
+        self._buffer += data
+        self._parse(final=False)
+        return self._drain()
+
+    def close(self) -> List[ListingRecord]:
+        self._parse(final=True)
+        return self._drain()
+
+    def _text(self, text: str):
+        if text:
+            self.handle_data(html.unescape(text) if "&" in text else text)
+
+    def _parse(self, final: bool):
+        buf = self._buffer
+        size = len(buf)
+        pos = 0
+
+        while pos < size:
+            if self._raw_tag is not None:
+                end = buf.find("</" + self._raw_tag, pos)
+                if end < 0:
+                    # Хвост придержим: закрывающий тег мог разорваться
+                    keep = size if final else max(pos, size - len(self._raw_tag) - 2)
+                    if keep > pos:
+                        self.handle_rawdata(buf[pos:keep])
+                    pos = keep
+                    break
+                if end > pos:
+                    self.handle_rawdata(buf[pos:end])
+                close = buf.find(">", end)
+                if close < 0:
+                    pos = size if final else end
+                    break
+                tag, self._raw_tag = self._raw_tag, None
+                self.handle_endtag(tag)
+                pos = close + 1
+                continue
+
+            lt = buf.find("<", pos)
+            if lt < 0:
+                if not final:
+                    # Текст без тегов: entity могла разорваться на границе куска
+                    break
+                if self.collect_text:
+                    self._text(buf[pos:])
+                pos = size
+                break
+            if lt > pos and self.collect_text:
+                self._text(buf[pos:lt])
+
+            if buf.startswith("<!--", lt):
+                end = buf.find("-->", lt + 4)
+                if end < 0:
+                    pos = size if final else lt
+                    break
+                pos = end + 3
+                continue
+            if buf.startswith(("<!", "<?"), lt):
+                end = buf.find(">", lt)
+                if end < 0:
+                    pos = size if final else lt
+                    break
+                pos = end + 1
+                continue
+
+            match = _TAG_RE.match(buf, lt)
+            if match is None:
+                # Тег мог оборваться на границе куска (в т.ч. внутри кавычек)
+                if not final and (size - lt < _MAX_TAG_LENGTH or buf.find(">", lt) < 0):
+                    pos = lt
+                    break
+                if self.collect_text:
+                    self.handle_data("<")
+                pos = lt + 1
+                continue
+
+            closing, tag, raw_attrs = match.groups()
+            tag = tag.lower()
+            if closing:
+                self.handle_endtag(tag)
+            else:
+                self.handle_starttag(tag, raw_attrs)
+                if tag in _RAW_TEXT_TAGS and not raw_attrs.endswith("/"):
+                    self._raw_tag = tag
+            pos = match.end()
+
+        self._buffer = "" if final else buf[pos:]
+
+
+def parse_attrs(raw_attrs: str) -> Dict[str, str]:
+    """Атрибуты тега из сырого текста (имена в нижнем регистре, entity раскрыты)"""
+    attributes = {}
+    for name, double, single, bare in _ATTR_RE.findall(raw_attrs):
+        value = double or single or bare
+        attributes[name.lower()] = html.unescape(value) if "&" in value else value
+    return attributes
+
+
+class AvitoExtractor(ListingExtractor):
+    """Объявления выдачи Avito из JSON-состояния и разметки карточек"""
+
+    def __init__(self, base_url: str = AVITO_BASE_URL, now: Optional[datetime] = None):
+        super().__init__()
+        self.base_url = base_url
+        self.now = now or datetime.now(timezone.utc)
+        # Открытая карточка: (тег, вложенность одноимённых тегов, поля)
+        self._card: Optional[Tuple[str, int, Dict[str, str]]] = None
+        # Поле, текст которого сейчас собирается: (тег, вложенность, имя)
+        self._capture: Optional[Tuple[str, int, str]] = None
+        self._captured: List[str] = []
+        self._script: Optional[List[str]] = None
+        # Состояние содержит всю выдачу - разметку карточек после него не разбираем
+        self._state_found = False
+
+    # --- разметка карточек ---
+
+    def handle_starttag(self, tag: str, raw_attrs: str):
+        if tag == "script":
+            # Внешние скрипты (src) пустые - копим только встроенные
+            self._script = None if "src" in parse_attrs(raw_attrs) else []
+            return
+        # Быстрый путь: вне карточки интересны только маркеры
+        if self._state_found or (self._card is None and "data-marker" not in raw_attrs):
+            return
+
+        attributes = parse_attrs(raw_attrs)
+        marker = attributes.get("data-marker")
+
+        if marker == "item":
+            self._finish_card()
+            self._card = (tag, 0, {})
+        elif self._card is not None:
+            card_tag, depth, fields = self._card
+            if tag == card_tag and tag not in _VOID_TAGS:
+                self._card = (card_tag, depth + 1, fields)
+        if self._card is None:
+            return
+
+        fields = self._card[2]
+        for name, value in attributes.items():
+            if name == "href" and "url" not in fields:
+                fields["url"] = value
+            elif name == "title" and marker in ("item", "item-title"):
+                fields.setdefault("title", value)
+            elif name == "data-price":
+                fields.setdefault("price", value)
+            elif name == "data-item-id":
+                fields.setdefault("item_id", value)
+            elif name == "content" and attributes.get("itemprop") == "price":
+                fields.setdefault("price", value)
+
+        if self._capture is not None:
+            capture_tag, depth, field = self._capture
+            if tag == capture_tag and tag not in _VOID_TAGS:
+                self._capture = (capture_tag, depth + 1, field)
+        elif marker in AVITO_FIELD_MARKERS and tag not in _VOID_TAGS:
+            field = AVITO_FIELD_MARKERS[marker]
+            if field not in fields:
+                self._capture = (tag, 0, field)
+                self._captured = []
+                self.collect_text = True
+
+    def handle_endtag(self, tag: str):
+        if tag == "script":
+            if self._script is not None:
+                self._parse_state("".join(self._script))
+                self._script = None
+            return
+
+        if self._capture is not None and tag == self._capture[0]:
+            capture_tag, depth, field = self._capture
+            if depth:
+                self._capture = (capture_tag, depth - 1, field)
+            else:
+                text = " ".join("".join(self._captured).split())
+                if text and self._card is not None:
+                    self._card[2].setdefault(field, text)
+                self._capture = None
+                self.collect_text = False
+
+        if self._card is not None and tag == self._card[0]:
+            card_tag, depth, fields = self._card
+            if depth:
+                self._card = (card_tag, depth - 1, fields)
+            else:
+                self._finish_card()
+
+    def handle_data(self, text: str):
+        self._captured.append(text)
+
+    def handle_rawdata(self, text: str):
+        if self._script is not None:
+            self._script.append(text)
+
+    def _finish_card(self):
+        if self._card is None:
+            return
+        fields = self._card[2]
+        self._card = None
+        self._capture = None
+        self.collect_text = False
+
+        url = fields.get("url")
+        title = fields.get("title")
+        if not url or not title:
+            return
+        url = urljoin(self.base_url, url)
+        item_id = fields.get("item_id") or self._item_id_from_url(url)
+        posted = fields.get("posted")
+        self._emit(ListingRecord(
+            item_id=item_id,
+            url=url,
+            title=title,
+            price_rub=parse_price(fields.get("price")),
+            seller=fields.get("seller"),
+            city=fields.get("city"),
+            posted_at=parse_posted_at(posted, self.now) if posted else None,
+        ))
+
+    @staticmethod
+    def _item_id_from_url(url: str) -> str:
+        match = _ITEM_ID_RE.search(url.split("?", 1)[0])
+        return match.group(1) if match else url.rstrip("/").rsplit("/", 1)[-1]
+
+    # --- JSON-состояние ---
+
+    def _parse_state(self, script: str):
+        state = None
+        match = _INITIAL_DATA_RE.search(script)
+        try:
+            if match:
+                state = json.loads(unquote(json.loads(f'"{match.group(1)}"')))
+            elif script.lstrip().startswith("{"):
+                body = script.strip()
+                try:
+                    state = json.loads(body)
+                except ValueError:
+                    state = json.loads(html.unescape(body))
+        except ValueError:
+            return
+        if state is not None:
+            for item in self._walk_items(state):
+                self._emit(self._record_from_state(item))
+                self._state_found = True
+
+    @classmethod
+    def _walk_items(cls, node: Any) -> Iterator[Dict]:
+        """Словари объявлений в любом месте состояния (структура часто меняется)"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if "id" in node and "title" in node and ("urlPath" in node or "url" in node):
+                    yield node
+                    continue
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+
+    def _record_from_state(self, item: Dict) -> Optional[ListingRecord]:
+        url = item.get("urlPath") or item.get("url")
+        if not isinstance(url, str) or not item.get("title"):
+            return None
+
+        price = item.get("priceDetailed") or item.get("price")
+        if isinstance(price, dict):
+            price = price.get("value", price.get("string"))
+
+        location = item.get("location") or {}
+        seller = item.get("sellerName") or (item.get("seller") or {}).get("name") \
+            or (item.get("userInfo") or {}).get("name")
+
+        return ListingRecord(
+            item_id=str(item["id"]),
+            url=urljoin(self.base_url, url),
+            title=str(item["title"]),
+            price_rub=parse_price(price),
+            seller=seller,
+            city=location.get("name") if isinstance(location, dict) else None,
+            posted_at=parse_timestamp(item.get("sortTimeStamp") or item.get("time")),
+        )
+
+
+EXTRACTORS = {
+    "avito": AvitoExtractor,
+}
+
+
+def iter_listings(source: str, chunks: Iterable[str], **options) -> Iterator[ListingRecord]:
+    """
+    Объявления страницы по мере разбора
+
+    Args:
+        source: Ключ EXTRACTORS ("avito")
+        chunks: Страница целиком (str) или её куски
+        **options: Параметры извлекателя (base_url, now)
+
+    Yields:
+        ListingRecord в порядке появления на странице
+    """
+    extractor = EXTRACTORS[source](**options)
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+    yield from extractor.close()
@@ -0,0 +1,322 @@
+"""
+Общий HTTP-клиент для парсеров и источников курса HunterBot
+
+Одна долгоживущая aiohttp-сессия на каждый прокси (и одна для прямых
+запросов): соединения переиспользуются между тиками планировщика,
+поэтому TCP/TLS рукопожатие с прокси, Avito, Юлой и Bybit происходит
+один раз, а не на каждый запуск парсера.
+
+fetch_text и fetch_stream принимают proxy=Pooled(...): прокси выбирает
+parser.proxy_pool, итог запроса идёт в его статистику, а после бана
+или сетевой ошибки запрос повторяется через другой прокси (до
+PROXY_ATTEMPTS попыток).
+"""
+import asyncio
+import codecs
+import time
+import aiohttp
+from loguru import logger
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
+from parser.proxy_pool import BAN_STATUSES, NoProxyAvailable, Pooled, proxy_label, proxy_pool
+from config import HTTP_LIMIT, HTTP_LIMIT_PER_HOST, HTTP_DNS_TTL, HTTP_KEEPALIVE, HTTP_TIMEOUT, PROXY_ATTEMPTS
+
+T = TypeVar("T")
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+}
+
+# Пулы соединений: ключ - адрес прокси (None - прямое подключение)
+_sessions: Dict[Optional[str], aiohttp.ClientSession] = {}
+_started = False
+
+
+def _create_session() -> aiohttp.ClientSession:
+    """Создает сессию с ограничениями пула, keep-alive и DNS-кешем"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_LIMIT,
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE,
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=DEFAULT_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+    )
+
+
+async def init_http_client():
+    """Запускает HTTP-клиент (вызывается в on_startup)"""
+    global _started
+
+    if _started:
+        return
+
+    _sessions[None] = _create_session()
+    _started = True
+    logger.info(
+        f"✅ HTTP клиент запущен (лимит {HTTP_LIMIT}, на хост {HTTP_LIMIT_PER_HOST}, "
+        f"прокси: {', '.join(proxy_label(proxy) for proxy in proxy_pool.proxies)})"
+    )
+
+
+async def close_http_client():
+    """Закрывает все пулы соединений"""
+    global _started
+
+    for proxy, session in list(_sessions.items()):
+        try:
+            await session.close()
+        except Exception as e:
+            logger.error(f"Ошибка закрытия HTTP сессии ({proxy or 'direct'}): {e}")
+    _sessions.clear()
+    _started = False
+    logger.info("✅ HTTP клиент остановлен")
+
+
+def get_session(proxy: Optional[str] = None) -> aiohttp.ClientSession:
+    """
+    Возвращает сессию для указанного прокси (ленивая инициализация)
+
+    Args:
+        proxy: Адрес прокси или None для прямого подключения
+
+    Returns:
+        aiohttp.ClientSession с собственным пулом соединений
+    """
+    session = _sessions.get(proxy)
+    if session is None or session.closed:
+        if not _started:
+            logger.warning("⚠️ HTTP клиент не запущен через on_startup, создаю сессию лениво")
+        session = _create_session()
+        _sessions[proxy] = session
+    return session
+
+
+async def _via_pool(
+    url: str,
+    route: Pooled,
+    request: Callable[[Optional[str]], Awaitable[Tuple[int, T]]],
+    can_retry: Callable[[], bool] = lambda: True
+) -> Tuple[int, T]:
+    """
+    Выполняет request(proxy) через пул прокси с отчётом и повтором
+
+    Повтор - через другой прокси после бана (403/429/407), 5xx или
+    сетевой ошибки, если can_retry() разрешает (тело ещё не отдано).
+
+    Returns:
+        (status, результат request) последней попытки
+    """
+    host = urlsplit(url).hostname or url
+    attempts = max(PROXY_ATTEMPTS, 1)
+    failure: Optional[BaseException] = None
+    tried = []
+    for attempt in range(1, attempts + 1):
+        try:
+            proxy = await proxy_pool.acquire(host, route.sticky, route.rps, avoid=tried)
+        except NoProxyAvailable:
+            # Остальные прокси на паузе - отдаём итог предыдущей попытки
+            if failure is not None:
+                raise failure
+            if attempt > 1:
+                return status, result
+            raise
+        tried.append(proxy)
+        started = time.monotonic()
+        try:
+            status, result = await request(proxy)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            proxy_pool.report(host, proxy, None, time.monotonic() - started)
+            if attempt == attempts or not can_retry():
+                raise
+            failure = e
+            continue
+        except BaseException:
+            proxy_pool.release(host, proxy)
+            raise
+
+        proxy_pool.report(host, proxy, status, time.monotonic() - started)
+        failure = None
+        retryable = status in BAN_STATUSES or status >= 500
+        if not retryable or attempt == attempts or not can_retry():
+            return status, result
+
+
+async def fetch_text(
+    url: str,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    proxy: Union[str, Pooled, None] = None,
+    timeout: Optional[float] = None
+) -> Tuple[int, str]:
+    """
+    GET-запрос с возвратом текста ответа
+
+    Args:
+        url: Адрес
+        params: Query-параметры
+        headers: Дополнительные заголовки
+        proxy: Прокси для запроса или Pooled(...) - прокси из пула
+        timeout: Таймаут запроса в секундах (по умолчанию HTTP_TIMEOUT)
+
+    Returns:
+        (status, text)
+    """
+    if isinstance(proxy, Pooled):
+        return await _via_pool(
+            url, proxy, lambda chosen: fetch_text(url, params, headers, chosen, timeout)
+        )
+
+    session = get_session(proxy)
+    async with session.get(
+        url,
+        params=params,
+        headers=headers,
+        proxy=proxy,
+        timeout=aiohttp.ClientTimeout(total=timeout or HTTP_TIMEOUT)
+    ) as resp:
+        return resp.status, await resp.text()
+
+
+async def fetch_stream(
+    url: str,
+    on_chunk: Callable[[str], None],
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    proxy: Union[str, Pooled, None] = None,
+    timeout: Optional[float] = None,
+    chunk_size: int = 65536
+) -> int:
+    """
+    GET-запрос с потоковой передачей текста ответа
+
+    Тело не собирается в одну строку: декодированные куски сразу
+    передаются в on_chunk (например, в ListingExtractor.feed).
+    При статусе не 200 тело не читается.
+
+    Args:
+        url: Адрес
+        on_chunk: Обработчик очередного куска текста
+        params: Query-параметры
+        headers: Дополнительные заголовки
+        proxy: Прокси для запроса или Pooled(...) - прокси из пула
+        timeout: Таймаут запроса в секундах (по умолчанию HTTP_TIMEOUT)
+        chunk_size: Размер читаемого куска в байтах
+
+    Returns:
+        HTTP статус
+    """
+    if isinstance(proxy, Pooled):
+        delivered = False
+
+        def forward(text: str):
+            nonlocal delivered
+            delivered = True
+            on_chunk(text)
+
+        async def request(chosen: Optional[str]) -> Tuple[int, None]:
+            return await fetch_stream(url, forward, params, headers, chosen, timeout, chunk_size), None
+
+        # Часть страницы уже ушла в on_chunk - повторять нельзя
+        status, _ = await _via_pool(url, proxy, request, can_retry=lambda: not delivered)
+        return status
+
+    session = get_session(proxy)
+    async with session.get(
+        url,
+        params=params,
+        headers=headers,
+        proxy=proxy,
+        timeout=aiohttp.ClientTimeout(total=timeout or HTTP_TIMEOUT)
+    ) as resp:
+        if resp.status != 200:
+            return resp.status
+        decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+        async for chunk in resp.content.iter_chunked(chunk_size):
+            text = decoder.decode(chunk)
+            if text:
+                on_chunk(text)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            on_chunk(tail)
+        return resp.status
+
+
+async def fetch_json(
+    url: str,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    proxy: Optional[str] = None,
+    timeout: Optional[float] = None
+):
+    """
+    GET-запрос с разбором JSON
+
+    Returns:
+        Распарсенный JSON ответа
+    """
+    session = get_session(proxy)
+    async with session.get(
+        url,
+        params=params,
+        headers=headers,
+        proxy=proxy,
+        timeout=aiohttp.ClientTimeout(total=timeout or HTTP_TIMEOUT)
+    ) as resp:
+        resp.raise_for_status()
+        return await resp.json(content_type=None)
+
+
+async def post_json(
+    url: str,
+    payload: dict,
+    headers: Optional[dict] = None,
+    proxy: Optional[str] = None,
+    timeout: Optional[float] = None
+):
+    """
+    POST-запрос с JSON-телом и разбором JSON-ответа
+
+    Returns:
+        Распарсенный JSON ответа
+    """
+    session = get_session(proxy)
+    async with session.post(
+        url,
+        json=payload,
+        headers=headers,
+        proxy=proxy,
+        timeout=aiohttp.ClientTimeout(total=timeout or HTTP_TIMEOUT)
+    ) as resp:
+        resp.raise_for_status()
+        return await resp.json(content_type=None)
+
+
+async def post_form(
+    url: str,
+    data: dict,
+    headers: Optional[dict] = None,
+    proxy: Optional[str] = None,
+    timeout: Optional[float] = None
+):
+    """
+    POST-запрос с телом application/x-www-form-urlencoded и разбором JSON-ответа
+
+    Returns:
+        Распарсенный JSON ответа
+    """
+    session = get_session(proxy)
+    async with session.post(
+        url,
+        data=data,
+        headers=headers,
+        proxy=proxy,
+        timeout=aiohttp.ClientTimeout(total=timeout or HTTP_TIMEOUT)
+    ) as resp:
+        resp.raise_for_status()
+        return await resp.json(content_type=None)
@@ -0,0 +1,67 @@
+"""
+Пакетная запись найденных сделок
+
+Все подходящие объявления прохода пишутся одной многострочной вставкой
+INSERT ... ON CONFLICT DO NOTHING RETURNING: дубликаты отсекают
+уникальные ограничения deals.avito_url/avito_item_id, а в ответ
+приходят только реально новые строки.
+"""
+from typing import Dict, List
+from loguru import logger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database.db import AsyncSessionLocal
+from database.models import Deal
+from database.stats import record_transition
+from parser.seen_index import seen_index
+
+# Поля кандидата, которые пишутся в deals (остальные - для уведомления)
+DEAL_COLUMNS = ("avito_url", "avito_item_id", "seller_name", "price_rub", "ton_amount", "profit_percent")
+
+
+async def ingest_deals(candidates: List[Dict]) -> List[Dict]:
+    """
+    Записывает кандидатов одной транзакцией
+
+    Args:
+        candidates: Словари с полями DEAL_COLUMNS и данными для уведомления
+
+    Returns:
+        Только новые кандидаты, дополненные ключом "id"
+    """
+    # Дубликаты внутри одного прохода (один лот по разным запросам)
+    unique: Dict[str, Dict] = {}
+    for candidate in candidates:
+        unique.setdefault(candidate["avito_url"], candidate)
+
+    if not unique:
+        return []
+
+    rows = [
+        {**{column: candidate[column] for column in DEAL_COLUMNS}, "user_id": 0}  # 0 - покупатель ещё не выбран
+        for candidate in unique.values()
+    ]
+
+    # Без явного conflict target: DO NOTHING срабатывает на любом
+    # уникальном ограничении (avito_url и avito_item_id)
+    stmt = (
+        pg_insert(Deal)
+        .values(rows)
+        .on_conflict_do_nothing()
+        .returning(Deal.id, Deal.avito_url)
+    )
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(stmt)
+        inserted = result.fetchall()
+        await record_transition(db, None, "new", count=len(inserted))
+        await db.commit()
+
+    # Теперь все кандидаты есть в deals - новые или ранее записанные
+    seen_index.update(candidate["avito_item_id"] for candidate in unique.values())
+
+    new_deals = []
+    for deal_id, avito_url in inserted:
+        new_deals.append({**unique[avito_url], "id": deal_id})
+
+    logger.info(f"💾 Записано новых сделок: {len(new_deals)} из {len(unique)}")
+    return new_deals
@@ -0,0 +1,269 @@
+"""
+Общий конвейер обработки объявлений всех площадок
+
+Проход площадки - цепочка стадий, связанных ограниченными очередями
+(PIPELINE_QUEUE_SIZE): медленная стадия (запись в БД, рассылка)
+притормаживает загрузку выдачи, а не копит объявления в памяти.
+
+    scan -> amount -> profit -> scam -> dedup -> persist -> notify
+
+scan     - новые объявления каждого запроса по курсорам выдачи
+amount   - объём TON из заголовка
+profit   - цена за TON и выгода относительно рынка
+scam     - проверка текста на мошенничество
+dedup    - повторы внутри прохода и уже записанные объявления
+persist  - пачки до PIPELINE_BATCH сделок одной вставкой; неполная пачка
+           пишется в конце прохода или через PIPELINE_LINGER после
+           первой сделки в ней, что наступит раньше
+notify   - рассылка подписчикам через очередь уведомлений
+
+Курсоры выдачи сохраняются только после успешного прохода.
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set
+from loguru import logger
+from parser.cursors import scrape_cursors
+from parser.extractors import ListingRecord
+from parser.ingest import ingest_deals
+from parser.seen_index import seen_index
+from parser.sources import ListingSource
+from parser.ton_price import get_ton_price
+from scam_check.checker import analyze_text_for_scam, get_scam_check_report
+from bot.utils.rate_limiter import gather_limited
+from bot.utils.notifier import notifier
+from bot.utils.subscriptions import subscriptions, detect_payment_methods
+from config import SCRAPE_CONCURRENCY, PIPELINE_QUEUE_SIZE, PIPELINE_BATCH, PIPELINE_LINGER
+
+MIN_TON_AMOUNT = 10.0
+MIN_PROFIT_PERCENT = 4.0
+MAX_RISK_SCORE = 70.0
+
+TON_AMOUNT_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(ton|тон|toncoin)')
+
+# Конец потока в очереди
+_DONE = object()
+
+
+@dataclass
+class PassStats:
+    """Итоги прохода площадки"""
+    listings: int = 0  # Новых объявлений в выдаче
+    deals: int = 0  # Новых выгодных сделок
+
+
+# --- стадии обработки одного объявления ---
+
+def parse_amount(record: ListingRecord, market_price: float) -> Optional[Dict]:
+    """Объём TON из заголовка; объявления без объёма и мелкие отбрасываются"""
+    if not record.price_rub:
+        return None
+    match = TON_AMOUNT_RE.search(record.title.lower())
+    if not match:
+        return None
+    ton_amount = float(match.group(1).replace(",", "."))
+    if ton_amount < MIN_TON_AMOUNT:
+        return None
+
+    return {
+        "avito_url": record.url,
+        "avito_item_id": record.item_id,
+        "seller_name": record.seller,
+        "city": record.city,
+        "posted_at": record.posted_at,
+        "price_rub": record.price_rub,
+        "ton_amount": ton_amount,
+        "title": record.title,
+    }
+
+
+def evaluate_profit(candidate: Dict, market_price: float) -> Optional[Dict]:
+    """Цена за TON и выгода; невыгодные отбрасываются"""
+    price_per_ton = candidate["price_rub"] / candidate["ton_amount"]
+    profit_percent = ((market_price - price_per_ton) / price_per_ton) * 100
+    if profit_percent < MIN_PROFIT_PERCENT:
+        return None
+    candidate["price_per_ton"] = price_per_ton
+    candidate["profit_percent"] = round(profit_percent, 1)
+    return candidate
+
+
+def score_scam(candidate: Dict, market_price: float) -> Optional[Dict]:
+    """Отбрасывает объявления с высоким риском мошенничества"""
+    is_suspicious, risk_score, flags = analyze_text_for_scam(candidate["title"])
+    if risk_score > MAX_RISK_SCORE:
+        logger.warning(f"Пропускаем подозрительное объявление (риск {risk_score}%): {candidate['title']}")
+        return None
+    candidate["risk_score"] = risk_score
+    return candidate
+
+
+def make_dedup() -> Callable[[Dict, float], Optional[Dict]]:
+    """Стадия дедупликации со своим множеством ссылок на проход"""
+    passed: Set[str] = set()
+
+    def dedup(candidate: Dict, market_price: float) -> Optional[Dict]:
+        # Один лот по разным запросам и уже записанные - без обращения к БД
+        if candidate["avito_url"] in passed or candidate["avito_item_id"] in seen_index:
+            return None
+        passed.add(candidate["avito_url"])
+        return candidate
+
+    return dedup
+
+
+def format_deal(source: ListingSource, deal: Dict, market_price: float) -> str:
+    """Текст уведомления о сделке"""
+    scam_report = get_scam_check_report(
+        deal["seller_name"],
+        deal["title"],
+        deal["price_per_ton"],
+        market_price
+    )
+    return (
+        f"{source.headline} Экономия <b>{deal['profit_percent']:.1f}%</b>\n\n"
+        f"📦 Объём: <b>{deal['ton_amount']} TON</b>\n"
+        f"💰 Цена: <b>{deal['price_rub']:,.0f} ₽</b>\n"
+        f"📈 За 1 TON: <b>{deal['price_per_ton']:.0f} ₽</b>\n"
+        f"💎 Рынок: <b>{market_price:.0f} ₽</b>\n\n"
+        f"{scam_report}\n\n"
+        f"🛒 <b>Купить через гарант:</b> <code>/deal_{deal['id']}</code>\n"
+        f"🔗 <a href='{deal['avito_url']}'>{source.link_text}</a>"
+    )
+
+
+# --- связка стадий ---
+
+async def _scan(source: ListingSource, outbox: asyncio.Queue, stats: PassStats):
+    async def scan_query(query: str):
+        records = await scrape_cursors.scan(source.name, query, lambda page: source.fetch_page(query, page))
+        stats.listings += len(records)
+        for record in records:
+            await outbox.put(source.normalize(record))
+
+    try:
+        # Запросы идут параллельно, частоту ограничивает token bucket площадки
+        await gather_limited(source.search_queries, scan_query, SCRAPE_CONCURRENCY)
+    finally:
+        await outbox.put(_DONE)
+
+
+async def _transform(
+    func: Callable[[object, float], Optional[object]],
+    inbox: asyncio.Queue,
+    outbox: asyncio.Queue,
+    market_price: float
+):
+    while True:
+        item = await inbox.get()
+        if item is _DONE:
+            await outbox.put(_DONE)
+            return
+        try:
+            result = func(item, market_price)
+        except Exception as e:
+            logger.error(f"Ошибка обработки объявления ({func.__name__}): {e}")
+            continue
+        if result is not None:
+            await outbox.put(result)
+
+
+async def _persist(inbox: asyncio.Queue, outbox: asyncio.Queue):
+    batch = []
+    deadline = 0.0
+    done = False
+    while not done:
+        # Срок считается от первой сделки в пачке: ровный поток кандидатов
+        # не откладывает запись дольше PIPELINE_LINGER
+        timeout = max(deadline - time.monotonic(), 0) if batch else None
+        try:
+            item = await asyncio.wait_for(inbox.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            item = None
+        if item is _DONE:
+            done = True
+        elif item is not None:
+            if not batch:
+                deadline = time.monotonic() + PIPELINE_LINGER
+            batch.append(item)
+
+        # Пачка полная, проход закончился или срок пачки вышел
+        if batch and (done or item is None or len(batch) >= PIPELINE_BATCH or time.monotonic() >= deadline):
+            for deal in await ingest_deals(batch):
+                await outbox.put(deal)
+            batch = []
+    await outbox.put(_DONE)
+
+
+async def _notify(source: ListingSource, inbox: asyncio.Queue, market_price: float, stats: PassStats):
+    while True:
+        deal = await inbox.get()
+        if deal is _DONE:
+            return
+        stats.deals += 1
+
+        # Только пользователи, чьи фильтры подходят под сделку
+        recipients = subscriptions.match(
+            deal["profit_percent"],
+            city=deal.get("city"),
+            payment_methods=detect_payment_methods(deal["title"])
+        )
+
+        # Доставку и лимиты Telegram берёт на себя диспетчер
+        notifier.enqueue_many(
+            recipients,
+            format_deal(source, deal, market_price),
+            parse_mode="HTML",
+            disable_web_page_preview=True
+        )
+
+        logger.success(
+            f"✅ Найдена сделка ({source.title}): {deal['profit_percent']:.1f}% "
+            f"({deal['ton_amount']} TON), получателей: {len(recipients)}"
+        )
+
+
+async def run_source(source: ListingSource) -> Optional[PassStats]:
+    """
+    Один проход площадки через весь конвейер
+
+    Args:
+        source: Плагин площадки
+
+    Returns:
+        Сколько новых объявлений и сделок найдено; None - проход пропущен,
+        потому что актуального курса TON нет
+    """
+    # Курс из кеша оракула, без запросов к бирже
+    market_price = get_ton_price()
+    if market_price is None:
+        logger.warning(f"⚠️ {source.title}: нет актуального курса TON, проход пропущен")
+        return None
+    stats = PassStats()
+    queues = [asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in range(6)]
+    stages = [parse_amount, evaluate_profit, score_scam, make_dedup()]
+
+    tasks = [asyncio.create_task(_scan(source, queues[0], stats))]
+    for index, func in enumerate(stages):
+        tasks.append(asyncio.create_task(_transform(func, queues[index], queues[index + 1], market_price)))
+    tasks.append(asyncio.create_task(_persist(queues[4], queues[5])))
+    tasks.append(asyncio.create_task(_notify(source, queues[5], market_price, stats)))
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        scrape_cursors.discard(source.name)
+        raise
+
+    try:
+        await scrape_cursors.commit(source.name)
+    except Exception as e:
+        # Сделки уже записаны; выдачу пересмотрим в следующий проход
+        logger.error(f"Ошибка сохранения курсоров {source.title}: {e}")
+        scrape_cursors.discard(source.name)
+    return stats
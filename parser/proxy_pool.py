@@ -0,0 +1,233 @@
+"""
+Пул прокси парсеров: оценка здоровья, взвешенный выбор, пауза после бана
+
+Список прокси берётся из SCRAPE_PROXIES (пустой - прямое подключение,
+оно учитывается как один "прокси" с адресом None). Состояние ведётся
+отдельно для каждой пары (хост, прокси): бан на Avito не мешает ходить
+через тот же прокси на Юлу.
+
+- здоровье - EWMA успешных ответов, задержка - EWMA времени запроса;
+  вес при выборе здоровье² / задержка / (1 + запросов в работе)
+- 403/429/407 - пауза PROXY_COOLDOWN, удваивается при повторных банах
+  до PROXY_MAX_COOLDOWN; PROXY_MAX_ERRORS сетевых ошибок/5xx подряд -
+  тоже пауза
+- запрос с ключом sticky (поисковый запрос) держится за одним прокси
+  PROXY_STICKY_TTL секунд, пока тот здоров: страницы одной выдачи
+  листаются с одного адреса
+- лимит частоты (token bucket) - на каждый прокси, поэтому общий темп
+  растёт с числом прокси
+
+Парсеры пул напрямую не вызывают: достаточно передать
+proxy=Pooled(...) в fetch_text/fetch_stream из parser.http_client.
+"""
+import random
+import time
+from dataclasses import dataclass
+from typing import Collection, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from loguru import logger
+from bot.utils.rate_limiter import get_rate_limiter
+from config import (
+    SCRAPE_PROXIES, PROXY_COOLDOWN, PROXY_MAX_COOLDOWN, PROXY_MAX_ERRORS, PROXY_STICKY_TTL,
+    SCRAPE_BURST, SCRAPE_JITTER
+)
+
+# Сглаживание здоровья и задержки
+HEALTH_ALPHA = 0.2
+LATENCY_ALPHA = 0.3
+# Нижняя граница здоровья: плохой прокси изредка получает пробный запрос
+MIN_HEALTH = 0.05
+# Ниже этого здоровья закрепление за запросом снимается
+STICKY_MIN_HEALTH = 0.5
+# Задержка прокси без замеров, если для хоста замеров ещё нет, секунды
+DEFAULT_LATENCY = 1.0
+
+BAN_STATUSES = {403, 407, 429}
+
+
+class NoProxyAvailable(RuntimeError):
+    """Все прокси для хоста на паузе"""
+
+
+@dataclass(frozen=True)
+class Pooled:
+    """Маршрут запроса через пул прокси (значение параметра proxy в http_client)"""
+    sticky: Optional[str] = None  # Ключ закрепления, например поисковый запрос
+    rps: Optional[float] = None  # Запросов в секунду на один прокси (None - без лимита)
+
+
+@dataclass
+class ProxyHealth:
+    """Состояние одного прокси для одного хоста"""
+    health: float = 1.0
+    latency: Optional[float] = None
+    errors: int = 0  # Ошибок подряд
+    bans: int = 0  # Банов подряд
+    cooldown_until: float = 0.0
+    in_flight: int = 0
+
+    def weight(self, default_latency: float) -> float:
+        latency = self.latency if self.latency is not None else default_latency
+        return max(self.health, MIN_HEALTH) ** 2 / max(latency, 0.05) / (1 + self.in_flight)
+
+
+def proxy_label(proxy: Optional[str]) -> str:
+    """Адрес прокси для логов, без логина и пароля"""
+    if proxy is None:
+        return "direct"
+    parts = urlsplit(proxy)
+    return f"{parts.hostname}:{parts.port}" if parts.hostname else proxy
+
+
+class ProxyPool:
+    """Прокси парсеров со статистикой по хостам"""
+
+    def __init__(
+        self,
+        proxies: List[str],
+        cooldown: float,
+        max_cooldown: float,
+        max_errors: int,
+        sticky_ttl: float
+    ):
+        self.proxies: List[Optional[str]] = list(dict.fromkeys(proxies)) or [None]
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_errors = max(max_errors, 1)
+        self.sticky_ttl = sticky_ttl
+        self._health: Dict[Tuple[str, Optional[str]], ProxyHealth] = {}
+        self._sticky: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+
+    def _state(self, host: str, proxy: Optional[str]) -> ProxyHealth:
+        key = (host, proxy)
+        state = self._health.get(key)
+        if state is None:
+            state = self._health[key] = ProxyHealth()
+        return state
+
+    def choose(self, host: str, sticky: Optional[str] = None, avoid: Collection[Optional[str]] = ()) -> Optional[str]:
+        """
+        Выбирает прокси для запроса к хосту
+
+        Args:
+            host: Хост запроса
+            sticky: Ключ закрепления или None
+            avoid: Прокси, которые уже не справились с этим запросом
+
+        Returns:
+            Адрес прокси (None - прямое подключение)
+
+        Raises:
+            NoProxyAvailable: все прокси для хоста на паузе
+        """
+        now = time.monotonic()
+        if sticky is not None:
+            pinned = self._sticky.get((host, sticky))
+            if pinned and pinned[1] > now and pinned[0] not in avoid:
+                state = self._state(host, pinned[0])
+                if state.cooldown_until <= now and state.health >= STICKY_MIN_HEALTH:
+                    return pinned[0]
+
+        ready = [proxy for proxy in self.proxies if self._state(host, proxy).cooldown_until <= now]
+        ready = [proxy for proxy in ready if proxy not in avoid] or ready
+        if not ready:
+            wait = min(self._state(host, proxy).cooldown_until for proxy in self.proxies) - now
+            raise NoProxyAvailable(f"все прокси для {host} на паузе ещё {wait:.0f}с")
+
+        # Прокси без замеров оцениваются как лучший из известных - чтобы их пробовали
+        measured = [self._state(host, p).latency for p in self.proxies if self._state(host, p).latency is not None]
+        default_latency = min(measured, default=DEFAULT_LATENCY)
+        weights = [self._state(host, p).weight(default_latency) for p in ready]
+        proxy = random.choices(ready, weights=weights)[0]
+        if sticky is not None:
+            self._sticky[(host, sticky)] = (proxy, now + self.sticky_ttl)
+        return proxy
+
+    async def acquire(
+        self,
+        host: str,
+        sticky: Optional[str] = None,
+        rps: Optional[float] = None,
+        avoid: Collection[Optional[str]] = ()
+    ) -> Optional[str]:
+        """
+        Выбирает прокси (см. choose) и ждёт его лимита частоты
+
+        После запроса обязателен report() или release() с тем же хостом и прокси.
+
+        Returns:
+            Адрес прокси (None - прямое подключение)
+        """
+        proxy = self.choose(host, sticky, avoid)
+        state = self._state(host, proxy)
+        state.in_flight += 1
+        if rps:
+            try:
+                await get_rate_limiter(f"{host}|{proxy_label(proxy)}", rps, SCRAPE_BURST, SCRAPE_JITTER).acquire()
+            except BaseException:
+                self.release(host, proxy)
+                raise
+        return proxy
+
+    def release(self, host: str, proxy: Optional[str]):
+        """Освобождает прокси без оценки (запрос отменён или упал не по вине сети)"""
+        state = self._state(host, proxy)
+        state.in_flight = max(state.in_flight - 1, 0)
+
+    def report(self, host: str, proxy: Optional[str], status: Optional[int], latency: float):
+        """
+        Учитывает итог запроса
+
+        Args:
+            host: Хост запроса
+            proxy: Прокси из acquire()
+            status: HTTP статус или None при сетевой ошибке/таймауте
+            latency: Длительность запроса, секунды
+        """
+        self.release(host, proxy)
+        state = self._state(host, proxy)
+
+        if status in BAN_STATUSES:
+            state.bans += 1
+            state.health *= 1 - HEALTH_ALPHA
+            pause = min(self.cooldown * 2 ** (state.bans - 1), self.max_cooldown)
+            state.cooldown_until = time.monotonic() + pause
+            logger.warning(f"⚠️ Прокси {proxy_label(proxy)} получил {status} от {host}, пауза {pause:.0f}с")
+            return
+
+        if status is None or status >= 500:
+            state.errors += 1
+            state.health *= 1 - HEALTH_ALPHA
+            if state.errors >= self.max_errors:
+                state.errors = 0
+                state.cooldown_until = time.monotonic() + self.cooldown
+                logger.warning(
+                    f"⚠️ Прокси {proxy_label(proxy)} не отвечает {host} (ошибок подряд: {self.max_errors}), "
+                    f"пауза {self.cooldown:.0f}с"
+                )
+            return
+
+        # Любой осмысленный ответ сайта (в том числе 404) - прокси исправен
+        state.errors = 0
+        state.bans = 0
+        state.health = HEALTH_ALPHA + (1 - HEALTH_ALPHA) * state.health
+        state.latency = latency if state.latency is None else (
+            LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * state.latency
+        )
+
+    def snapshot(self) -> List[Dict]:
+        """Состояние пула для логов и админки"""
+        now = time.monotonic()
+        return [
+            {
+                "host": host,
+                "proxy": proxy_label(proxy),
+                "health": round(state.health, 2),
+                "latency": round(state.latency, 2) if state.latency is not None else None,
+                "cooldown": max(round(state.cooldown_until - now), 0),
+            }
+            for (host, proxy), state in self._health.items()
+        ]
+
+
+proxy_pool = ProxyPool(SCRAPE_PROXIES, PROXY_COOLDOWN, PROXY_MAX_COOLDOWN, PROXY_MAX_ERRORS, PROXY_STICKY_TTL)
@@ -0,0 +1,152 @@
+"""
+Адаптивное расписание проходов площадок
+
+У каждой площадки свой цикл: проход, затем пауза, рассчитанная по
+темпу появления новых объявлений. Темп оценивается EWMA (новых
+объявлений в секунду) и дополнительно запоминается по часам суток,
+поэтому в активные часы интервал сокращается заранее, а не после первых
+пропущенных сделок.
+
+Интервал обратно пропорционален корню из темпа: при том же числе
+запросов это минимизирует среднюю задержку от публикации до
+уведомления (частота 1/темп тратила бы запросы поровну на каждое
+объявление и проигрывала бы фиксированному интервалу). Базовый интервал
+площадки соответствует темпу SCRAPE_TARGET_NEW объявлений за проход;
+вчетверо быстрее - вдвое чаще. Границы -
+SCRAPE_MIN_INTERVAL..SCRAPE_MAX_INTERVAL.
+
+Два прохода одной площадки одновременно не выполняются: цикл
+последовательный, а внешний вызов sweep() при идущем проходе
+пропускается.
+"""
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from loguru import logger
+from parser.pipeline import PassStats, run_source
+from parser.sources import ListingSource
+from config import (
+    SCRAPE_MIN_INTERVAL, SCRAPE_MAX_INTERVAL, SCRAPE_TARGET_NEW, SCRAPE_EWMA_ALPHA
+)
+
+# Сглаживание профиля темпа по часам суток
+HOURLY_ALPHA = 0.3
+
+
+@dataclass
+class AdaptiveInterval:
+    """Оценка темпа новых объявлений и интервал до следующего прохода"""
+    base_interval: float
+    interval: Optional[float] = None
+    min_interval: float = SCRAPE_MIN_INTERVAL
+    max_interval: float = SCRAPE_MAX_INTERVAL
+    target_new: float = SCRAPE_TARGET_NEW
+    alpha: float = SCRAPE_EWMA_ALPHA
+    rate: Optional[float] = None  # EWMA, объявлений в секунду
+    hourly: List[Optional[float]] = field(default_factory=lambda: [None] * 24)
+
+    def __post_init__(self):
+        if self.interval is None:
+            self.interval = self.base_interval
+
+    def observe(self, new_listings: int, window: float, hour: int) -> float:
+        """
+        Учитывает итог прохода и пересчитывает интервал
+
+        Args:
+            new_listings: Новых объявлений за проход
+            window: Сколько секунд выдачи покрыл проход (с прошлого прохода)
+            hour: Час суток прохода
+
+        Returns:
+            Интервал до следующего прохода, секунды
+        """
+        sample = new_listings / max(window, 1.0)
+        self.rate = sample if self.rate is None else self.alpha * sample + (1 - self.alpha) * self.rate
+        previous = self.hourly[hour]
+        self.hourly[hour] = sample if previous is None else HOURLY_ALPHA * sample + (1 - HOURLY_ALPHA) * previous
+
+        # В начале активных часов профиль опережает EWMA
+        upcoming = self.hourly[(hour + 1) % 24] or 0.0
+        rate = max(self.rate, self.hourly[hour], upcoming)
+
+        # Пустые проходы сами тянут темп вниз, отдельный backoff не нужен
+        interval = math.sqrt(self.target_new * self.base_interval / rate) if rate > 0 else self.max_interval
+        self.interval = min(self.max_interval, max(self.min_interval, interval))
+        return self.interval
+
+
+class ScrapeScheduler:
+    """Циклы проходов площадок с адаптивным интервалом"""
+
+    def __init__(self):
+        self._schedules: Dict[str, AdaptiveInterval] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_sweep: Dict[str, float] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def sweep(self, source: ListingSource) -> Optional[PassStats]:
+        """
+        Один проход площадки, если она не проходится прямо сейчас
+
+        Returns:
+            Итоги прохода или None, если проход пропущен или упал
+        """
+        lock = self._locks.setdefault(source.name, asyncio.Lock())
+        if lock.locked():
+            logger.warning(f"⚠️ {source.title}: предыдущий проход ещё идёт, пропускаю")
+            return None
+
+        async with lock:
+            started = time.monotonic()
+            previous = self._last_sweep.get(source.name)
+            self._last_sweep[source.name] = started
+            try:
+                stats = await run_source(source)
+            except Exception as e:
+                logger.error(f"Критическая ошибка парсера {source.title}: {e}")
+                return None
+            if stats is None:
+                # Выдачу не смотрели: новые объявления достанутся следующему проходу
+                if previous is None:
+                    del self._last_sweep[source.name]
+                else:
+                    self._last_sweep[source.name] = previous
+                return None
+
+        schedule = self._schedules.setdefault(source.name, AdaptiveInterval(source.base_interval))
+        # Первый проход после запуска покрывает неизвестный промежуток - темп не оцениваем
+        if previous is not None:
+            schedule.observe(stats.listings, started - previous, datetime.now().hour)
+        interval = schedule.interval
+        logger.info(
+            f"📡 {source.title}: новых объявлений {stats.listings}, сделок {stats.deals}, "
+            f"за {time.monotonic() - started:.1f}с, следующий проход через {interval:.0f}с"
+        )
+        return stats
+
+    async def _loop(self, source: ListingSource):
+        schedule = self._schedules.setdefault(source.name, AdaptiveInterval(source.base_interval))
+        while True:
+            await self.sweep(source)
+            await asyncio.sleep(schedule.interval)
+
+    def start(self, sources: Iterable[ListingSource]):
+        """Запускает цикл для каждой площадки (вызывается в on_startup)"""
+        for source in sources:
+            if source.name in self._tasks:
+                continue
+            self._tasks[source.name] = asyncio.create_task(self._loop(source))
+            logger.info(f"✅ Парсер {source.title} запущен (старт с интервала {source.base_interval:.0f}с)")
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+
+scrape_scheduler = ScrapeScheduler()
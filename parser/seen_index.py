@@ -0,0 +1,68 @@
+"""
+Индекс уже виденных объявлений для дедупликации без запросов к БД
+"""
+from collections import OrderedDict
+from typing import Iterable, Optional
+from loguru import logger
+from sqlalchemy import select
+from database.db import AsyncSessionLocal
+from database.models import Deal
+from config import SEEN_INDEX_SIZE
+
+
+class SeenIndex:
+    """
+    LRU-ограниченное множество ID объявлений
+
+    Попадание в индекс точно означает, что объявление уже в deals.
+    Промах не гарантирует новизну (запись могла быть вытеснена или
+    добавлена другим процессом), поэтому на промахе нужна проверка в БД.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, None]" = OrderedDict()
+
+    def __contains__(self, item_id: str) -> bool:
+        if item_id in self._items:
+            self._items.move_to_end(item_id)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item_id: Optional[str]):
+        """Запоминает ID, вытесняя самые старые при переполнении"""
+        if not item_id:
+            return
+        self._items[item_id] = None
+        self._items.move_to_end(item_id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def update(self, item_ids: Iterable[str]):
+        for item_id in item_ids:
+            self.add(item_id)
+
+
+seen_index = SeenIndex(SEEN_INDEX_SIZE)
+
+
+async def warm_seen_index():
+    """Загружает последние avito_item_id из deals (вызывается в on_startup)"""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Deal.avito_item_id)
+                .where(Deal.avito_item_id.isnot(None))
+                .order_by(Deal.id.desc())
+                .limit(SEEN_INDEX_SIZE)
+            )
+            item_ids = [row[0] for row in result.fetchall()]
+
+        # Старые первыми, чтобы свежие оказались в конце LRU
+        seen_index.update(reversed(item_ids))
+        logger.info(f"✅ Индекс объявлений прогрет: {len(seen_index)} записей")
+    except Exception as e:
+        logger.error(f"Ошибка прогрева индекса объявлений: {e}")
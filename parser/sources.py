@@ -0,0 +1,73 @@
+"""
+Плагины площадок объявлений
+
+Площадка описывается подклассом ListingSource: загрузка страницы
+выдачи с извлечением объявлений (fetch_page) и приведение записи к
+общему виду (normalize). Всё остальное - курсоры выдачи, разбор объёма
+TON, выгода, проверка на мошенничество, дедупликация, запись и рассылка -
+общее для всех площадок и живёт в parser.pipeline.
+
+Новая площадка: подкласс ListingSource в своём модуле,
+register_source(...) при импорте и запуск через run_source().
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence
+from parser.extractors import ListingRecord
+
+
+class PageFetchError(Exception):
+    """Страница выдачи не загрузилась (статус, сеть, прокси) - это не пустая выдача"""
+
+
+class ListingSource(ABC):
+    """Площадка объявлений: fetch -> extract -> normalize"""
+
+    name: str = ""  # Ключ в курсорах и логах: avito, yula
+    title: str = ""  # Для логов
+    headline: str = "🔥 <b>ВЫГОДНАЯ СДЕЛКА!</b>"
+    link_text: str = ""  # Текст ссылки на объявление в уведомлении
+    default_seller: str = ""
+    search_queries: Sequence[str] = ()
+    base_interval: float = 180.0  # Стартовый интервал проходов, дальше подстраивается
+
+    @abstractmethod
+    async def fetch_page(self, query: str, page: int) -> List[ListingRecord]:
+        """
+        Страница выдачи по запросу, свежие объявления первыми
+
+        Args:
+            query: Поисковый запрос
+            page: Номер страницы с 1
+
+        Returns:
+            Объявления страницы (пустой список - выдача закончилась)
+
+        Raises:
+            PageFetchError: страница не загрузилась
+        """
+
+    def normalize(self, record: ListingRecord) -> ListingRecord:
+        """Приводит запись к общему виду (продавец, длины полей)"""
+        record.seller = (record.seller or self.default_seller)[:100]
+        return record
+
+
+SOURCES: Dict[str, ListingSource] = {}
+
+
+def register_source(source: ListingSource) -> ListingSource:
+    """
+    Регистрирует площадку (вызывается при импорте её модуля)
+
+    Подкласс без fetch_page не создаётся (TypeError от ABC), так что
+    неполный плагин падает при импорте, а не посреди прохода.
+
+    Raises:
+        TypeError: не ListingSource или без имени
+    """
+    if not isinstance(source, ListingSource):
+        raise TypeError(f"{type(source).__name__} не наследует ListingSource")
+    if not source.name:
+        raise TypeError(f"У площадки {type(source).__name__} не задано name")
+    SOURCES[source.name] = source
+    return source
@@ -1,24 +1,167 @@
-import aiohttp
+"""
+Оракул курса TON/RUB
+
+Курс обновляется в фоне раз в PRICE_REFRESH_INTERVAL секунд и собирается
+из нескольких источников: TON/USDT (Bybit, OKX) и USDT/RUB (Bybit P2P,
+ЦБ РФ как USD/RUB). По каждой паре берется медиана ответивших источников.
+Читатели получают закешированное значение без сетевых запросов. Курс
+старше PRICE_MAX_AGE (или ещё ни одного успешного обновления) не
+отдается вовсе - вместо него None, и запускается внеочередное
+обновление: сделки по выдуманному или устаревшему курсу хуже, чем
+пропущенный проход.
+"""
+import asyncio
+import statistics
+import time
+from typing import List, Optional, Tuple
 from loguru import logger
+from parser.http_client import fetch_json, post_json
+from config import PRICE_REFRESH_INTERVAL, PRICE_MAX_AGE
+
+
+async def _ton_usdt_bybit() -> float:
+    data = await fetch_json(
+        "https://api.bybit.com/v5/market/tickers",
+        params={"category": "spot", "symbol": "TONUSDT"},
+        timeout=10
+    )
+    return float(data["result"]["list"][0]["lastPrice"])
+
+
+async def _ton_usdt_okx() -> float:
+    data = await fetch_json(
+        "https://www.okx.com/api/v5/market/ticker",
+        params={"instId": "TON-USDT"},
+        timeout=10
+    )
+    return float(data["data"][0]["last"])
+
+
+async def _usdt_rub_bybit_p2p() -> float:
+    data = await post_json(
+        "https://api2.bybit.com/fiat/otc/item/online",
+        {"tokenId": "USDT", "currencyId": "RUB", "side": "1", "size": "10", "page": "1"},
+        timeout=10
+    )
+    prices = [float(item["price"]) for item in data["result"]["items"]]
+    return statistics.median(prices)
+
+
+async def _usd_rub_cbr() -> float:
+    data = await fetch_json("https://www.cbr-xml-daily.ru/daily_json.js", timeout=10)
+    return float(data["Valute"]["USD"]["Value"])
+
+
+TON_USDT_SOURCES = {"bybit": _ton_usdt_bybit, "okx": _ton_usdt_okx}
+USDT_RUB_SOURCES = {"bybit_p2p": _usdt_rub_bybit_p2p, "cbr": _usd_rub_cbr}
+
+
+async def _median_quote(sources: dict, pair: str) -> Optional[float]:
+    """Опрашивает источники параллельно и возвращает медиану успешных ответов"""
+    names = list(sources)
+    results = await asyncio.gather(*(sources[name]() for name in names), return_exceptions=True)
+
+    quotes: List[float] = []
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Источник {name} ({pair}) недоступен: {result}")
+        elif result > 0:
+            quotes.append(result)
+
+    return statistics.median(quotes) if quotes else None
+
+
+class PriceOracle:
+    """Закешированный курс TON/RUB с фоновым обновлением"""
+
+    def __init__(self, refresh_interval: float, max_age: float):
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._price: Optional[float] = None
+        self._updated = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    @property
+    def age(self) -> float:
+        """Возраст курса в секундах (inf если курса ещё нет)"""
+        return time.monotonic() - self._updated if self._price is not None else float("inf")
+
+    def get(self) -> Tuple[Optional[float], float]:
+        """
+        Текущий курс без сетевых запросов
+
+        Returns:
+            (price, age) - курс в рублях (None, если курса нет или он старше
+            max_age) и его возраст в секундах
+        """
+        age = self.age
+        if age > self.max_age:
+            self._revalidate()
+            return None, age
+        return self._price, age
+
+    @property
+    def price(self) -> Optional[float]:
+        return self.get()[0]
+
+    async def refresh(self) -> Optional[float]:
+        """Опрашивает все источники и обновляет кеш"""
+        ton_usdt, usdt_rub = await asyncio.gather(
+            _median_quote(TON_USDT_SOURCES, "TON/USDT"),
+            _median_quote(USDT_RUB_SOURCES, "USDT/RUB")
+        )
+        if ton_usdt is None or usdt_rub is None:
+            logger.error(f"Не удалось обновить курс TON, текущему значению {self.age:.0f}с")
+            return None
+
+        self._price = round(ton_usdt * usdt_rub, 2)
+        self._updated = time.monotonic()
+        logger.info(f"📈 Курс TON: {self._price:.2f} ₽ ({ton_usdt:.3f} USDT × {usdt_rub:.2f} ₽)")
+        return self._price
+
+    def _revalidate(self):
+        """Запускает внеочередное обновление, если оно ещё не идет"""
+        if self._refreshing is None or self._refreshing.done():
+            try:
+                self._refreshing = asyncio.get_running_loop().create_task(self.refresh())
+            except RuntimeError:
+                pass
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка получения курса TON: {e}")
+
+    async def start(self):
+        """Первое обновление и запуск фонового цикла (вызывается в on_startup)"""
+        if self._task:
+            return
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Ошибка получения курса TON: {e}")
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"✅ Оракул курса TON запущен (обновление каждые {self.refresh_interval:.0f}с)")
+
+    async def stop(self):
+        for task in (self._task, self._refreshing):
+            if task and not task.done():
+                task.cancel()
+        self._task = None
+
+
+price_oracle = PriceOracle(PRICE_REFRESH_INTERVAL, PRICE_MAX_AGE)
+
+
+def get_ton_price() -> Optional[float]:
+    """Актуальный курс TON/RUB из кеша (без I/O); None - курса нет или он устарел"""
+    return price_oracle.price
+
 
-async def get_ton_price_rub() -> float:
-    """Получает актуальный курс TON/RUB"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            # Bybit P2P
-            async with session.get(
-                "https://api.bybit.com/v5/market/p2p/ticker",
-                params={"category": "spot", "symbol": "TONUSDT"},
-                timeout=10
-            ) as resp:
-                data = await resp.json()
-                bybit_price = float(data["result"]["list"][0]["lastPrice"]) * 97  # Примерный курс USD/RUB
-
-            # Fallback на фиксированный курс
-            final_price = max(bybit_price, 80.0)  # Минимум 80₽
-            logger.info(f"📈 Курс TON: {final_price:.2f} ₽")
-            return round(final_price, 2)
-            
-    except Exception as e:
-        logger.error(f"Ошибка получения курса TON: {e}")
-        return 87.0  # Надежный fallback
\ No newline at end of file
+async def get_ton_price_rub() -> Optional[float]:
+    """Получает актуальный курс TON/RUB (совместимость: значение берется из кеша)"""
+    return price_oracle.price
@@ -0,0 +1,77 @@
+"""
+Автомат Ахо-Корасик для поиска подстрок из словаря
+
+Поиск любого слова словаря в строке за O(len(text)) независимо от
+размера словаря. Автомат неизменяемый: при изменении словаря строится
+новый и подменяется целиком, поэтому читателям не нужны блокировки.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class AhoCorasick:
+    """Словарь подстрок с поиском за один проход по тексту"""
+
+    def __init__(self, words: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Optional[str]] = [None]
+        self._size = 0
+
+        for word in words:
+            if word:
+                self._insert(word)
+        self._build_links()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _insert(self, word: str):
+        node = 0
+        for ch in word:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][ch] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            node = child
+        if self._out[node] is None:
+            self._size += 1
+        self._out[node] = word
+
+    def _build_links(self):
+        """Суффиксные ссылки обходом в ширину"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # Совпадение по суффиксной ссылке - тоже совпадение
+                if self._out[child] is None:
+                    self._out[child] = self._out[self._fail[child]]
+                queue.append(child)
+
+    def find(self, text: str) -> Optional[str]:
+        """
+        Первое слово словаря, входящее в текст
+
+        Args:
+            text: Текст для поиска
+
+        Returns:
+            Найденное слово или None
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] is not None:
+                return out[node]
+        return None
@@ -0,0 +1,181 @@
+"""
+Черный список продавцов
+
+Записи хранятся в таблице seller_blacklist, в памяти - автомат
+Ахо-Корасик по всем активным подстрокам: проверка имени занимает
+O(len(name)) при любом размере списка. Каждое изменение получает новый
+номер версии из последовательности, и фоновое обновление забирает только
+записи новее последней загруженной версии, после чего автомат
+перестраивается и подменяется целиком.
+
+Номер версии выдаётся при nextval, а не при коммите: транзакция с
+версией 10 может закоммититься после того, как версия 11 уже прочитана.
+Поэтому каждое обновление перечитывает окно из VERSION_OVERLAP версий
+ниже загруженной (строка хранит итоговое состояние записи, повторное
+применение безвредно), а раз в BLACKLIST_FULL_RELOAD секунд список
+перечитывается целиком.
+"""
+import asyncio
+import time
+from typing import Optional, Set
+from sqlalchemy import text
+from loguru import logger
+from database.db import AsyncSessionLocal
+from scam_check.automaton import AhoCorasick
+from config import BLACKLIST_REFRESH_INTERVAL, BLACKLIST_FULL_RELOAD
+
+# Начальное наполнение таблицы при первом запуске
+BLACKLIST = [
+    "scam_user1", "scam_user2", "мошенник", "развод",
+    "обман", "кидала", "не платит"
+]
+
+
+# Сколько версий ниже загруженной перечитывать (поздние коммиты)
+VERSION_OVERLAP = 1000
+
+
+def normalize_pattern(pattern: str) -> str:
+    return (pattern or "").strip().lower()
+
+
+class SellerBlacklist:
+    """Черный список в памяти с инкрементальным обновлением из БД"""
+
+    def __init__(self, seed, refresh_interval: float, full_reload_interval: float):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self._last_full = 0.0
+        self._entries: Set[str] = {normalize_pattern(p) for p in seed if normalize_pattern(p)}
+        self._automaton = AhoCorasick(self._entries)
+        self._version = 0
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, seller_name: str) -> Optional[str]:
+        """Запись черного списка, входящая в имя продавца, или None"""
+        return self._automaton.find(seller_name.lower())
+
+    async def _seed(self):
+        """Заполняет пустую таблицу начальным списком"""
+        async with AsyncSessionLocal() as db:
+            exists = (await db.execute(text("SELECT 1 FROM seller_blacklist LIMIT 1"))).first()
+            if exists is None:
+                await db.execute(
+                    text("INSERT INTO seller_blacklist (pattern, is_active) VALUES (:pattern, true) ON CONFLICT DO NOTHING"),
+                    [{"pattern": pattern} for pattern in sorted(self._entries)]
+                )
+                await db.commit()
+
+    async def refresh(self, full: bool = False) -> int:
+        """
+        Загружает изменения новее последней версии (с окном перекрытия)
+
+        Args:
+            full: Перечитать таблицу целиком
+
+        Returns:
+            Количество изменений, поменявших список
+        """
+        async with self._lock:
+            full = full or self._version == 0
+            since = 0 if full else max(self._version - VERSION_OVERLAP, 0)
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    text(
+                        "SELECT pattern, is_active, version FROM seller_blacklist "
+                        "WHERE version > :version ORDER BY version"
+                    ),
+                    {"version": since}
+                )
+                changes = result.fetchall()
+            if full:
+                self._last_full = time.monotonic()
+            if not changes:
+                return 0
+
+            # Полная загрузка заменяет текущий список (и начальный) содержимым таблицы
+            entries = set() if full else set(self._entries)
+            for pattern, is_active, version in changes:
+                if is_active:
+                    entries.add(pattern)
+                else:
+                    entries.discard(pattern)
+
+            self._version = max(self._version, changes[-1].version)
+            applied = len(entries ^ self._entries)
+            if not applied:
+                return 0
+
+            self._automaton = AhoCorasick(entries)
+            self._entries = entries
+            logger.info(f"🚫 Черный список обновлён: {len(entries)} записей (версия {self._version})")
+            return applied
+
+    async def add(self, pattern: str, reason: Optional[str] = None, added_by: Optional[int] = None) -> bool:
+        """Добавляет (или восстанавливает) запись и сразу применяет её локально"""
+        pattern = normalize_pattern(pattern)
+        if not pattern:
+            return False
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                text(
+                    "INSERT INTO seller_blacklist (pattern, reason, added_by, is_active) "
+                    "VALUES (:pattern, :reason, :added_by, true) "
+                    "ON CONFLICT (pattern) DO UPDATE SET is_active = true, reason = EXCLUDED.reason, "
+                    "added_by = EXCLUDED.added_by, version = nextval('seller_blacklist_version_seq')"
+                ),
+                {"pattern": pattern, "reason": reason, "added_by": added_by}
+            )
+            await db.commit()
+        await self.refresh()
+        return True
+
+    async def remove(self, pattern: str) -> bool:
+        """Снимает запись с черного списка"""
+        pattern = normalize_pattern(pattern)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text(
+                    "UPDATE seller_blacklist SET is_active = false, "
+                    "version = nextval('seller_blacklist_version_seq') "
+                    "WHERE pattern = :pattern AND is_active RETURNING id"
+                ),
+                {"pattern": pattern}
+            )
+            removed = result.scalar() is not None
+            await db.commit()
+        if removed:
+            await self.refresh()
+        return removed
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh(full=time.monotonic() - self._last_full >= self.full_reload_interval)
+            except Exception as e:
+                logger.error(f"Ошибка обновления черного списка: {e}")
+
+    async def start(self):
+        """Загрузка из БД и запуск фонового обновления (вызывается в on_startup)"""
+        if self._task:
+            return
+        try:
+            await self._seed()
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки черного списка: {e}")
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"✅ Черный список продавцов загружен: {len(self)} записей")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self._task = None
+
+
+seller_blacklist = SellerBlacklist(BLACKLIST, BLACKLIST_REFRESH_INTERVAL, BLACKLIST_FULL_RELOAD)
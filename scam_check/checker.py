@@ -2,14 +2,9 @@
 Продвинутая система проверки мошенников для HunterBot
 """
 import re
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from loguru import logger
-
-# База данных известных скамеров (в продакшене - использовать PostgreSQL)
-BLACKLIST = [
-    "scam_user1", "scam_user2", "мошенник", "развод",
-    "обман", "кидала", "не платит"
-]
+from scam_check.blacklist import BLACKLIST, seller_blacklist
 
 # Красные флаги в тексте объявлений
 RED_FLAGS = [
@@ -47,14 +42,69 @@ def check_seller(seller_name: str) -> bool:
     if not seller_name:
         return True
     
-    seller_lower = seller_name.lower()
-    for blacklisted in BLACKLIST:
-        if blacklisted.lower() in seller_lower:
-            logger.warning(f"⚠️ Продавец '{seller_name}' в черном списке!")
-            return False
+    if seller_blacklist.find(seller_name) is not None:
+        logger.warning(f"⚠️ Продавец '{seller_name}' в черном списке!")
+        return False
     return True
 
 
+class ScamTextAnalyzer:
+    """
+    Анализатор текста объявления с заранее скомпилированными паттернами
+
+    Паттерны компилируются один раз при создании. Каждый скомпилированный
+    паттерн сканирует текст в C с быстрым поиском литерального префикса;
+    в CPython это быстрее общей альтернации всех паттернов, которую sre
+    проверяет ветка за веткой на каждой позиции.
+    """
+
+    EMOJI = re.compile(r"[\U0001F300-\U0001F9FF]")
+    TON = re.compile(r"ton|тон")  # toncoin начинается с ton
+
+    def __init__(self, red_flags: List[str], suspicious_patterns: List[str]):
+        self._red_flags = [(flag, re.compile(flag)) for flag in red_flags]
+        self._suspicious = [re.compile(pattern) for pattern in suspicious_patterns]
+
+    def analyze(self, text: str) -> Tuple[bool, float, list]:
+        """То же, что analyze_text_for_scam, без логирования"""
+        if not text:
+            return (False, 0.0, [])
+
+        text_lower = text.lower()
+        detected_flags = [flag for flag, regex in self._red_flags if regex.search(text_lower)]
+        risk_score = 15.0 * len(detected_flags)
+        risk_score += 10.0 * sum(1 for regex in self._suspicious if regex.search(text_lower))
+
+        # Слишком короткое описание
+        if len(text) < 50:
+            risk_score += 5.0
+
+        # Нет упоминания TON
+        if not self.TON.search(text_lower):
+            risk_score += 10.0
+
+        # CAPS LOCK (крик)
+        caps_ratio = sum(map(str.isupper, text)) / max(len(text), 1)
+        if caps_ratio > 0.5:
+            risk_score += 20.0
+            detected_flags.append("СЛИШКОМ МНОГО ЗАГЛАВНЫХ БУКВ")
+
+        # Эмодзи спам: дальше одиннадцатого считать незачем
+        emoji_count = 0
+        for _ in self.EMOJI.finditer(text):
+            emoji_count += 1
+            if emoji_count > 10:
+                risk_score += 15.0
+                detected_flags.append("Слишком много эмодзи")
+                break
+
+        risk_score = min(risk_score, 100.0)
+        return (risk_score >= 40.0, risk_score, detected_flags)
+
+
+_analyzer = ScamTextAnalyzer(RED_FLAGS, SUSPICIOUS_PATTERNS)
+
+
 def analyze_text_for_scam(text: str) -> Tuple[bool, float, list]:
     """
     AI-подобный анализ текста объявления на признаки мошенничества
@@ -68,48 +118,7 @@ def analyze_text_for_scam(text: str) -> Tuple[bool, float, list]:
         - risk_score: 0-100, где 100 = максимальный риск
         - detected_flags: Список обнаруженных красных флагов
     """
-    if not text:
-        return (False, 0.0, [])
-    
-    text_lower = text.lower()
-    detected_flags = []
-    risk_score = 0.0
-    
-    # Проверка красных флагов
-    for flag in RED_FLAGS:
-        if re.search(flag, text_lower):
-            detected_flags.append(flag)
-            risk_score += 15.0
-    
-    # Проверка подозрительных паттернов
-    for pattern in SUSPICIOUS_PATTERNS:
-        if re.search(pattern, text_lower):
-            risk_score += 10.0
-    
-    # Проверка на слишком короткое описание
-    if len(text) < 50:
-        risk_score += 5.0
-    
-    # Проверка на отсутствие деталей
-    if not re.search(r'(ton|тон|toncoin)', text_lower):
-        risk_score += 10.0
-    
-    # Проверка на CAPS LOCK (крик)
-    caps_ratio = sum(1 for c in text if c.isupper()) / max(len(text), 1)
-    if caps_ratio > 0.5:
-        risk_score += 20.0
-        detected_flags.append("СЛИШКОМ МНОГО ЗАГЛАВНЫХ БУКВ")
-    
-    # Проверка на эмодзи спам
-    emoji_count = len(re.findall(r'[\U0001F300-\U0001F9FF]', text))
-    if emoji_count > 10:
-        risk_score += 15.0
-        detected_flags.append("Слишком много эмодзи")
-    
-    # Ограничиваем risk_score до 100
-    risk_score = min(risk_score, 100.0)
-    
-    is_suspicious = risk_score >= 40.0
+    is_suspicious, risk_score, detected_flags = _analyzer.analyze(text)
     
     if is_suspicious:
         logger.warning(f"⚠️ Подозрительное объявление! Риск: {risk_score:.1f}%")
@@ -3,25 +3,24 @@
 """
 from database.db import AsyncSessionLocal
 from database.models import SellerRating, SellerReview
+from bot.utils.cache import AsyncTTLCache
+from config import RATING_CACHE_SIZE, RATING_CACHE_TTL, RATING_CACHE_NEGATIVE_TTL
 from loguru import logger
 from datetime import datetime, timezone
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterable, List, Tuple
+from sqlalchemy import Float, cast, func, literal, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 
-async def get_seller_rating(seller_name: str, platform: str = "avito") -> Optional[Dict]:
-    """
-    Получает рейтинг продавца
-    
-    Args:
-        seller_name: Имя продавца
-        platform: Платформа (avito, yula, telegram)
-        
-    Returns:
-        Словарь с данными рейтинга или None
-    """
+# Рейтинги и отзывы читаются на каждое уведомление - держим их в памяти
+_rating_cache = AsyncTTLCache(RATING_CACHE_SIZE, RATING_CACHE_TTL, RATING_CACHE_NEGATIVE_TTL)
+_reviews_cache = AsyncTTLCache(RATING_CACHE_SIZE, RATING_CACHE_TTL, RATING_CACHE_NEGATIVE_TTL)
+
+
+async def _load_seller_rating(seller_name: str, platform: str) -> Optional[Dict]:
     async with AsyncSessionLocal() as db:
         result = await db.execute(
-            "SELECT * FROM seller_ratings WHERE seller_name = :name AND platform = :platform",
+            text("SELECT * FROM seller_ratings WHERE seller_name = :name AND platform = :platform"),
             {"name": seller_name, "platform": platform}
         )
         rating = result.fetchone()
@@ -41,6 +40,102 @@ async def get_seller_rating(seller_name: str, platform: str = "avito") -> Option
         }
 
 
+async def get_seller_rating(seller_name: str, platform: str = "avito") -> Optional[Dict]:
+    """
+    Получает рейтинг продавца (через кеш)
+    
+    Args:
+        seller_name: Имя продавца
+        platform: Платформа (avito, yula, telegram)
+        
+    Returns:
+        Словарь с данными рейтинга или None
+    """
+    return await _rating_cache.get_or_load(
+        (seller_name, platform),
+        lambda: _load_seller_rating(seller_name, platform)
+    )
+
+
+def _trust_score_sql(total, successful, volume):
+    """
+    Формула доверия в SQL: 70% - доля успешных сделок, 30% - объём до 100k₽
+
+    Args:
+        total, successful, volume: SQL-выражения итоговых значений
+    """
+    success_rate = cast(successful, Float) * 100.0 / cast(total, Float)
+    volume_factor = func.least(cast(volume, Float) / 100000.0, 1.0)
+    return func.greatest(0.0, func.least(100.0, success_rate * 0.7 + volume_factor * 30.0))
+
+
+async def update_seller_ratings_bulk(outcomes: Iterable[Tuple[str, str, bool, float]]) -> int:
+    """
+    Применяет пачку исходов сделок одним INSERT ... ON CONFLICT DO UPDATE
+    
+    Args:
+        outcomes: Исходы (seller_name, platform, deal_successful, deal_volume)
+        
+    Returns:
+        Количество обновлённых продавцов
+    """
+    # Одна строка на продавца: ON CONFLICT не может обновить строку дважды
+    totals: Dict[Tuple[str, str], List] = {}
+    for seller_name, platform, deal_successful, deal_volume in outcomes:
+        total = totals.setdefault((seller_name, platform), [0, 0, 0, 0.0])
+        total[0] += 1
+        total[1 if deal_successful else 2] += 1
+        total[3] += deal_volume
+    
+    if not totals:
+        return 0
+    
+    now = datetime.now(timezone.utc)
+    rows = []
+    for (seller_name, platform), (total, successful, failed, volume) in totals.items():
+        # Первая сделка нового продавца - фиксированная оценка, дальше формула
+        if total == 1:
+            initial_trust = 80.0 if successful else 20.0
+        else:
+            initial_trust = _trust_score_sql(literal(total), literal(successful), literal(volume))
+        rows.append({
+            "seller_name": seller_name,
+            "platform": platform,
+            "total_deals": total,
+            "successful_deals": successful,
+            "failed_deals": failed,
+            "total_volume_rub": volume,
+            "trust_score": initial_trust,
+            "last_seen": now,
+            "created_at": now,
+        })
+    
+    stmt = pg_insert(SellerRating).values(rows)
+    new_total = SellerRating.total_deals + stmt.excluded.total_deals
+    new_successful = SellerRating.successful_deals + stmt.excluded.successful_deals
+    new_volume = SellerRating.total_volume_rub + stmt.excluded.total_volume_rub
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_seller_platform",
+        set_={
+            "total_deals": new_total,
+            "successful_deals": new_successful,
+            "failed_deals": SellerRating.failed_deals + stmt.excluded.failed_deals,
+            "total_volume_rub": new_volume,
+            "trust_score": _trust_score_sql(new_total, new_successful, new_volume),
+            "last_seen": stmt.excluded.last_seen,
+        }
+    )
+    
+    async with AsyncSessionLocal() as db:
+        await db.execute(stmt)
+        await db.commit()
+    
+    for key in totals:
+        _rating_cache.invalidate(key)
+    
+    return len(rows)
+
+
 async def update_seller_rating(
     seller_name: str, 
     platform: str,
@@ -48,7 +143,7 @@ async def update_seller_rating(
     deal_volume: float
 ) -> bool:
     """
-    Обновляет рейтинг продавца после сделки
+    Обновляет рейтинг продавца после сделки (один атомарный запрос)
     
     Args:
         seller_name: Имя продавца
@@ -60,64 +155,9 @@ async def update_seller_rating(
         True если успешно
     """
     try:
-        async with AsyncSessionLocal() as db:
-            # Ищем существующий рейтинг
-            result = await db.execute(
-                "SELECT id, total_deals, successful_deals, failed_deals, total_volume_rub, trust_score "
-                "FROM seller_ratings WHERE seller_name = :name AND platform = :platform",
-                {"name": seller_name, "platform": platform}
-            )
-            existing = result.fetchone()
-            
-            if existing:
-                # Обновляем существующий
-                rating_id, total, successful, failed, volume, trust = existing
-                
-                new_total = total + 1
-                new_successful = successful + (1 if deal_successful else 0)
-                new_failed = failed + (0 if deal_successful else 1)
-                new_volume = volume + deal_volume
-                
-                # Рассчитываем новый trust_score
-                success_rate = (new_successful / new_total) * 100
-                volume_factor = min(new_volume / 100000, 1.0)  # До 100k₽ максимум
-                
-                new_trust = (success_rate * 0.7) + (volume_factor * 30)
-                new_trust = max(0, min(100, new_trust))
-                
-                await db.execute(
-                    "UPDATE seller_ratings SET "
-                    "total_deals = :total, successful_deals = :successful, "
-                    "failed_deals = :failed, total_volume_rub = :volume, "
-                    "trust_score = :trust, last_seen = :now "
-                    "WHERE id = :id",
-                    {
-                        "total": new_total,
-                        "successful": new_successful,
-                        "failed": new_failed,
-                        "volume": new_volume,
-                        "trust": new_trust,
-                        "now": datetime.now(timezone.utc),
-                        "id": rating_id
-                    }
-                )
-            else:
-                # Создаем новый
-                from database.models import SellerRating
-                new_rating = SellerRating(
-                    seller_name=seller_name,
-                    platform=platform,
-                    total_deals=1,
-                    successful_deals=1 if deal_successful else 0,
-                    failed_deals=0 if deal_successful else 1,
-                    total_volume_rub=deal_volume,
-                    trust_score=80.0 if deal_successful else 20.0
-                )
-                db.add(new_rating)
-            
-            await db.commit()
-            logger.info(f"✅ Обновлён рейтинг продавца: {seller_name}")
-            return True
+        await update_seller_ratings_bulk([(seller_name, platform, deal_successful, deal_volume)])
+        logger.info(f"✅ Обновлён рейтинг продавца: {seller_name}")
+        return True
             
     except Exception as e:
         logger.error(f"Ошибка обновления рейтинга: {e}")
@@ -161,6 +201,8 @@ async def add_seller_review(
             db.add(review)
             await db.commit()
             
+            _reviews_cache.invalidate_where(lambda key: key[0] == seller_name)
+            
             logger.info(f"✅ Добавлен отзыв о продавце {seller_name}: {rating}/5")
             return True
             
@@ -169,22 +211,14 @@ async def add_seller_review(
         return False
 
 
-async def get_seller_reviews(seller_name: str, limit: int = 10) -> list:
-    """
-    Получает последние отзывы о продавце
-    
-    Args:
-        seller_name: Имя продавца
-        limit: Количество отзывов
-        
-    Returns:
-        Список отзывов
-    """
+async def _load_seller_reviews(seller_name: str, limit: int) -> list:
     async with AsyncSessionLocal() as db:
         result = await db.execute(
-            "SELECT rating, review_text, is_scam, created_at "
-            "FROM seller_reviews WHERE seller_name = :name "
-            "ORDER BY created_at DESC LIMIT :limit",
+            text(
+                "SELECT rating, review_text, is_scam, created_at "
+                "FROM seller_reviews WHERE seller_name = :name "
+                "ORDER BY created_at DESC LIMIT :limit"
+            ),
             {"name": seller_name, "limit": limit}
         )
         reviews = result.fetchall()
@@ -200,6 +234,23 @@ async def get_seller_reviews(seller_name: str, limit: int = 10) -> list:
         ]
 
 
+async def get_seller_reviews(seller_name: str, limit: int = 10) -> list:
+    """
+    Получает последние отзывы о продавце (через кеш)
+    
+    Args:
+        seller_name: Имя продавца
+        limit: Количество отзывов
+        
+    Returns:
+        Список отзывов
+    """
+    return await _reviews_cache.get_or_load(
+        (seller_name, limit),
+        lambda: _load_seller_reviews(seller_name, limit)
+    )
+
+
 def format_seller_rating(rating_data: Dict) -> str:
     """
     Форматирует данные рейтинга для отображения